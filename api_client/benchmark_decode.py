@@ -0,0 +1,45 @@
+"""compare the generated from_dict() with motis_api_client.fast_decode for recorded responses
+
+curl -o plan.json 'https://api.transitous.org/api/v6/plan?fromPlace=...&toPlace=...&numItineraries=256'
+python benchmark_decode.py plan.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from motis_api_client import fast_decode
+from motis_api_client.models import PlanResponse200
+
+
+def measure(func, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("responses", nargs="+", type=Path, help="recorded /plan responses")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for path in args.responses:
+        content = path.read_bytes()
+        generated = PlanResponse200.from_dict(json.loads(content))
+        if fast_decode.from_json(PlanResponse200, content) != generated:
+            raise ValueError(f"fast_decode returned a different result for {path}")
+        before = measure(lambda: PlanResponse200.from_dict(json.loads(content)), args.repeat)
+        after = measure(lambda: fast_decode.from_json(PlanResponse200, content), args.repeat)
+        print(f"{path.name} ({len(generated.itineraries)} itineraries, {len(content) / 1e6:.2f} MB)")
+        print(f"  json.loads + from_dict() {before * 1000:9.2f} ms")
+        print(f"  fast_decode.from_json()  {after * 1000:9.2f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Run many requests of one endpoint concurrently over the shared httpx.AsyncClient
+
+Example:
+    from motis_api_client import Client, batch
+    from motis_api_client.api.routing import plan
+
+    async with Client(base_url="https://api.transitous.org") as client:
+        params = [{"from_place": a, "to_place": b} for a, b in od_pairs]
+        async for result in batch.as_completed(plan, client=client, params=params, max_concurrency=16):
+            if result.error is not None:
+                print(result.index, result.error)
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Iterable, Mapping
+from types import ModuleType
+from typing import Any
+
+from attrs import define, evolve
+
+from .client import AuthenticatedClient, Client
+from .types import Response
+
+
+@define
+class BatchResult:
+    """The outcome of one request of a batch
+
+    Attributes:
+        index: Position of the parameters in the iterable passed to the batch
+        params: Keyword arguments of the endpoint for this request
+        response: The response, if the request didn't fail
+        error: The exception raised by this request (e.g. a timeout or an `errors.UnexpectedStatus`)
+    """
+
+    index: int
+    params: Mapping[str, Any]
+    response: Response[Any] | None = None
+    error: Exception | None = None
+
+    @property
+    def parsed(self) -> Any:
+        """The parsed response (e.g. `PlanResponse200` or `Error`), or `None` if the request failed"""
+        if self.response is None:
+            return None
+        return self.response.parsed
+
+
+async def _request(
+    endpoint: ModuleType,
+    client: AuthenticatedClient | Client,
+    index: int,
+    params: Mapping[str, Any],
+    timeout: float | None,
+) -> BatchResult:
+    try:
+        kwargs = endpoint._get_kwargs(**params)
+        # the timeout covers the whole request including reading the body, not just each network operation
+        response = await asyncio.wait_for(client.get_async_httpx_client().request(**kwargs), timeout)
+        return BatchResult(index, params, response=endpoint._build_response(client=client, response=response))
+    except Exception as e:
+        return BatchResult(index, params, error=e)
+
+
+async def as_completed(
+    endpoint: ModuleType,
+    *,
+    client: AuthenticatedClient | Client,
+    params: Iterable[Mapping[str, Any]],
+    max_concurrency: int = 8,
+    timeout: float | None = None,
+) -> AsyncIterator[BatchResult]:
+    """Request an endpoint once for every set of parameters and yield the results as soon as they arrive.
+
+    Args:
+        endpoint: A module of `motis_api_client.api` (e.g. `motis_api_client.api.routing.plan`)
+        client: Its `get_async_httpx_client()` is used for all requests
+        params: Keyword arguments of the endpoint's `asyncio_detailed()` (without `client`) for every request,
+            this is only consumed as fast as requests are started, so it can be a long generator
+        max_concurrency: Maximum number of requests at the same time
+        timeout: Maximum number of seconds for each request
+
+    Returns:
+        A `BatchResult` for every request, errors are returned in it instead of being raised
+
+    Raises:
+        ValueError: If `max_concurrency` is less than 1
+        Exception: The error raised while iterating over `params`, the requests still running are cancelled
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, not {max_concurrency}")
+    results: asyncio.Queue[BatchResult | Exception | None] = asyncio.Queue()
+    items = enumerate(params)
+
+    async def worker() -> None:
+        try:
+            # all workers take the next parameters from the same iterator
+            for index, item in items:
+                await results.put(await _request(endpoint, client, index, item, timeout))
+        except Exception as e:
+            # only errors of `params` itself end up here, the ones of the requests are in their BatchResult
+            await results.put(e)
+        finally:
+            await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_concurrency)]
+    try:
+        running = len(workers)
+        while running:
+            result = await results.get()
+            if result is None:
+                running -= 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def asyncio_detailed(
+    endpoint: ModuleType,
+    *,
+    client: AuthenticatedClient | Client,
+    params: Iterable[Mapping[str, Any]],
+    max_concurrency: int = 8,
+    timeout: float | None = None,
+) -> list[BatchResult]:
+    """Like `as_completed()`, but return all results in the order of `params` once the batch is done"""
+    results = [
+        result
+        async for result in as_completed(
+            endpoint, client=client, params=params, max_concurrency=max_concurrency, timeout=timeout
+        )
+    ]
+    return sorted(results, key=lambda result: result.index)
+
+
+def sync_detailed(
+    endpoint: ModuleType,
+    *,
+    client: AuthenticatedClient | Client,
+    params: Iterable[Mapping[str, Any]],
+    max_concurrency: int = 8,
+    timeout: float | None = None,
+) -> list[BatchResult]:
+    """Blocking version of `asyncio_detailed()`, running the batch in a new event loop.
+
+    An `httpx.AsyncClient` can only be used in one event loop, so the batch uses a new one with the same settings
+    as `client` and closes it afterward.
+    """
+    batch_client = evolve(client)
+
+    async def run() -> list[BatchResult]:
+        async with batch_client:
+            return await asyncio_detailed(
+                endpoint, client=batch_client, params=params, max_concurrency=max_concurrency, timeout=timeout
+            )
+
+    return asyncio.run(run())
@@ -0,0 +1,318 @@
+"""Opt-in caching of responses, in memory (LRU) and optionally on disk
+
+The cache is an httpx transport, so it works for all endpoints (sync and async) without changing the generated code.
+Only GET requests of endpoints with a TTL in `ResponseCache.ttls` are cached (see `default_ttls`), keyed on the
+method, server (scheme, host and port), path and sorted query parameters of the request.
+Once an entry is older than its TTL, it is revalidated with `If-None-Match` if the server sent an `ETag`.
+
+Example:
+    from pathlib import Path
+
+    from motis_api_client import Client
+    from motis_api_client.cache import CachingTransport, ResponseCache
+
+    cache = ResponseCache(directory=Path("~/.cache/motis_api_client").expanduser())
+    client = Client(base_url="https://api.transitous.org", httpx_args={"transport": CachingTransport(cache)})
+    ...
+    print(cache.stats.hit_rate)
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+import httpx
+from attrs import define, field
+
+# seconds a response is used without asking the server again, by path without the `/api/<version>/` prefix
+default_ttls: dict[str, float] = {
+    "geocode": 24 * 60 * 60,
+    "reverse-geocode": 24 * 60 * 60,
+    "map/initial": 24 * 60 * 60,
+    "map/levels": 24 * 60 * 60,
+    "map/stops": 60 * 60,
+    "map/routes": 60 * 60,
+    "map/route-details": 60 * 60,
+    # these include realtime data
+    "stoptimes": 30,
+    "plan": 30,
+    "trip": 30,
+}
+
+_version_prefix = re.compile(r"^/api/[^/]+/")
+
+# the body is stored decoded, so these would be wrong for it
+_dropped_headers = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _atomic_write(path: Path, content: bytes) -> None:
+    """Write to a temporary file in the same directory first, so that other processes never read a partial file"""
+    with tempfile.NamedTemporaryFile("wb", dir=path.parent, delete=False) as f:
+        try:
+            f.write(content)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+def _dump_entry(entry: "CacheEntry") -> bytes:
+    """The entry as one line of JSON with everything but the body, followed by the body as it is"""
+    metadata = {
+        "status_code": entry.status_code,
+        "headers": entry.headers,
+        "stored_at": entry.stored_at,
+        "etag": entry.etag,
+    }
+    return json.dumps(metadata).encode() + b"\n" + entry.content
+
+
+def _load_entry(data: bytes) -> "CacheEntry":
+    """The entry written by `_dump_entry()`
+
+    Raises:
+        ValueError: If `data` isn't an entry
+    """
+    line, separator, content = data.partition(b"\n")
+    metadata = json.loads(line)
+    if not separator or not isinstance(metadata, dict):
+        raise ValueError("not a cache entry")
+    status_code = metadata.get("status_code")
+    headers = metadata.get("headers")
+    stored_at = metadata.get("stored_at")
+    etag = metadata.get("etag")
+    if (
+        not isinstance(status_code, int)
+        or not isinstance(headers, list)
+        or not all(
+            isinstance(header, list) and len(header) == 2 and all(isinstance(part, str) for part in header)
+            for header in headers
+        )
+        or not isinstance(stored_at, (int, float))
+        or not (etag is None or isinstance(etag, str))
+    ):
+        raise ValueError("invalid cache entry")
+    return CacheEntry(status_code, [(key, value) for key, value in headers], content, stored_at, etag)
+
+
+@define
+class CacheStats:
+    """Counts of how requests were answered
+
+    Attributes:
+        hits: Answered from the cache without asking the server
+        misses: Sent to the server, because there was no usable entry
+        revalidations: Answered from the cache after the server confirmed it with `304 Not Modified`
+        evictions: Entries removed from memory because of `max_entries`
+    """
+
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses + self.revalidations
+        return (self.hits + self.revalidations) / total if total else 0.0
+
+
+@define
+class CacheEntry:
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    stored_at: float
+    etag: str | None = None
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "CacheEntry":
+        headers = [(key, value) for key, value in response.headers.items() if key.lower() not in _dropped_headers]
+        return cls(response.status_code, headers, response.content, time.time(), response.headers.get("ETag"))
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(self.status_code, headers=self.headers, content=self.content, request=request)
+
+
+@define
+class ResponseCache:
+    """The entries and statistics of a cache, shared by all clients using a `CachingTransport` with it
+
+    Attributes:
+        ttls: Seconds an entry is used without asking the server again, by path without the `/api/<version>/` prefix,
+            responses of other paths aren't cached
+        max_entries: Maximum number of entries in memory, the least recently used one is removed first
+        directory: If set, all entries are also stored there and used by other processes or after a restart
+    """
+
+    ttls: Mapping[str, float] = field(factory=lambda: dict(default_ttls))
+    max_entries: int = 1024
+    directory: Path | None = None
+    stats: CacheStats = field(factory=CacheStats, init=False)
+    _entries: OrderedDict[str, CacheEntry] = field(factory=OrderedDict, init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    def ttl(self, request: httpx.Request) -> float | None:
+        if request.method != "GET":
+            return None
+        return self.ttls.get(_version_prefix.sub("", request.url.path))
+
+    @staticmethod
+    def key(request: httpx.Request) -> str:
+        # with the server, as clients of different servers can share the cache (and its directory)
+        url = request.url
+        origin = f"{url.scheme}://{url.host}" if url.port is None else f"{url.scheme}://{url.host}:{url.port}"
+        params = sorted(url.params.multi_items())
+        return f"{request.method} {origin}{url.path}?{httpx.QueryParams(params)}"
+
+    def _path(self, key: str) -> Path:
+        # the directory might be shared, so entries are stored as JSON and the raw body (see `_dump_entry()`)
+        # and never unpickled, which could run any code
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}.entry"
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory is None:
+            return None
+        try:
+            entry = _load_entry(self._path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        self._remember(key, entry)
+        if self.directory is None:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            _atomic_write(self._path(key), _dump_entry(entry))
+        except OSError:
+            # the entry is still cached in memory
+            pass
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.directory is not None:
+            for path in self.directory.glob("*.entry"):
+                path.unlink(missing_ok=True)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+
+class CachingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """An httpx transport answering requests from a `ResponseCache` if possible
+
+    It can be used by both the `httpx.Client` and the `httpx.AsyncClient` of a `Client`. The requests that are sent
+    go to `transport` or `async_transport`, by default an `httpx.HTTPTransport` or `httpx.AsyncHTTPTransport` created
+    with `transport_args` (e.g. `verify`), as httpx doesn't create its own transport if one is passed.
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        transport: httpx.BaseTransport | None = None,
+        async_transport: httpx.AsyncBaseTransport | None = None,
+        **transport_args: Any,
+    ):
+        self.cache = cache
+        self.transport_args = transport_args
+        self._transport = transport
+        self._async_transport = async_transport
+
+    def _lookup(self, request: httpx.Request) -> tuple[str | None, CacheEntry | None, httpx.Response | None]:
+        """the key and entry of the request, and the response if it can be answered from the cache"""
+        ttl = self.cache.ttl(request)
+        if ttl is None:
+            return None, None, None
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+        if entry is None:
+            return key, None, None
+        if time.time() - entry.stored_at < ttl:
+            self.cache._count("hits")
+            return key, entry, entry.to_response(request)
+        if entry.etag is not None:
+            request.headers["If-None-Match"] = entry.etag
+        return key, entry, None
+
+    def _store(self, request: httpx.Request, key: str, entry: CacheEntry | None, response: httpx.Response):
+        if response.status_code == 304 and entry is not None:
+            self.cache._count("revalidations")
+            entry = CacheEntry(entry.status_code, entry.headers, entry.content, time.time(), entry.etag)
+            self.cache.put(key, entry)
+            return entry.to_response(request)
+        self.cache._count("misses")
+        if response.status_code != 200:
+            return response
+        entry = CacheEntry.from_response(response)
+        self.cache.put(key, entry)
+        return entry.to_response(request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._transport is None:
+            self._transport = httpx.HTTPTransport(**self.transport_args)
+        key, entry, cached = self._lookup(request)
+        if cached is not None:
+            return cached
+        response = self._transport.handle_request(request)
+        if key is None:
+            return response
+        try:
+            response.read()
+        finally:
+            response.close()
+        return self._store(request, key, entry, response)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._async_transport is None:
+            self._async_transport = httpx.AsyncHTTPTransport(**self.transport_args)
+        key, entry, cached = self._lookup(request)
+        if cached is not None:
+            return cached
+        response = await self._async_transport.handle_async_request(request)
+        if key is None:
+            return response
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        return self._store(request, key, entry, response)
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def aclose(self) -> None:
+        if self._async_transport is not None:
+            await self._async_transport.aclose()
+            self._async_transport = None
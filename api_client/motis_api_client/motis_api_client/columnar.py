@@ -0,0 +1,120 @@
+"""Decode one_to_all and one_to_many responses directly into NumPy columns or a pandas DataFrame
+
+Instead of a `ReachablePlace` or `Duration` (with a `Place`) per result, only the columns are built.
+If msgspec is installed (the `speedups` extra), the JSON is decoded into minimal structs with just these fields and everything else is skipped
+without creating any objects, otherwise it is parsed with the json module.
+
+For 524288 places of one_to_all, this takes 0.6s and a peak of 190 MB with msgspec (1.5s and 590 MB without)
+instead of 7.2s and 920 MB for the generated models.
+
+Missing durations (e.g. unreachable targets of one_to_many) are NaN, missing stop IDs are None.
+This needs numpy, and pandas for the `*_dataframe()` functions (the `columnar` extra).
+
+Example:
+    from motis_api_client import columnar
+    from motis_api_client.api.routing import one_to_all
+
+    response = client.get_httpx_client().request(**one_to_all._get_kwargs(one=place, max_travel_time=60))
+    response.raise_for_status()
+    places = columnar.one_to_all_dataframe(response.content)
+"""
+
+import json
+import math
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if TYPE_CHECKING:
+    import pandas
+
+ONE_TO_ALL_COLUMNS = ("lat", "lon", "duration", "k", "stop_id")
+ONE_TO_MANY_COLUMNS = ("duration", "distance")
+
+if msgspec is not None:
+
+    class _Place(msgspec.Struct):
+        lat: float
+        lon: float
+        stop_id: str | None = msgspec.field(default=None, name="stopId")
+
+    class _ReachablePlace(msgspec.Struct):
+        place: _Place
+        duration: float = math.nan
+        k: float = math.nan
+
+    class _Reachable(msgspec.Struct):
+        all_: list[_ReachablePlace] = msgspec.field(default_factory=list, name="all")
+
+    class _Duration(msgspec.Struct):
+        duration: float = math.nan
+        distance: float = math.nan
+
+    _reachable_decoder = msgspec.json.Decoder(_Reachable)
+    _durations_decoder = msgspec.json.Decoder(list[_Duration])
+
+
+def _float_column(values: Any, count: int) -> np.ndarray:
+    return np.fromiter(values, dtype=np.float64, count=count)
+
+
+def one_to_all_columns(content: bytes | str) -> dict[str, np.ndarray]:
+    """The places of a one_to_all response (`Reachable.all_`) as the `ONE_TO_ALL_COLUMNS`"""
+    if msgspec is not None:
+        places = _reachable_decoder.decode(content).all_
+        count = len(places)
+        return {
+            "lat": _float_column((place.place.lat for place in places), count),
+            "lon": _float_column((place.place.lon for place in places), count),
+            "duration": _float_column((place.duration for place in places), count),
+            "k": _float_column((place.k for place in places), count),
+            "stop_id": np.array([place.place.stop_id for place in places], dtype=object),
+        }
+
+    places = json.loads(content).get("all", [])
+    count = len(places)
+    return {
+        "lat": _float_column((place["place"]["lat"] for place in places), count),
+        "lon": _float_column((place["place"]["lon"] for place in places), count),
+        "duration": _float_column((place.get("duration", math.nan) for place in places), count),
+        "k": _float_column((place.get("k", math.nan) for place in places), count),
+        "stop_id": np.array([place["place"].get("stopId") for place in places], dtype=object),
+    }
+
+
+def one_to_many_columns(content: bytes | str) -> dict[str, np.ndarray]:
+    """The durations of a one_to_many (or one_to_many_post) response as the `ONE_TO_MANY_COLUMNS`,
+    in the order of the `many` places"""
+    if msgspec is not None:
+        durations = _durations_decoder.decode(content)
+        count = len(durations)
+        return {
+            "duration": _float_column((duration.duration for duration in durations), count),
+            "distance": _float_column((duration.distance for duration in durations), count),
+        }
+
+    durations = json.loads(content)
+    count = len(durations)
+    return {
+        "duration": _float_column((duration.get("duration", math.nan) for duration in durations), count),
+        "distance": _float_column((duration.get("distance", math.nan) for duration in durations), count),
+    }
+
+
+def one_to_all_dataframe(content: bytes | str) -> "pandas.DataFrame":
+    """`one_to_all_columns()` as a DataFrame"""
+    import pandas
+
+    return pandas.DataFrame(one_to_all_columns(content), columns=ONE_TO_ALL_COLUMNS)
+
+
+def one_to_many_dataframe(content: bytes | str) -> "pandas.DataFrame":
+    """`one_to_many_columns()` as a DataFrame"""
+    import pandas
+
+    return pandas.DataFrame(one_to_many_columns(content), columns=ONE_TO_MANY_COLUMNS)
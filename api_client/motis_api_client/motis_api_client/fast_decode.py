@@ -0,0 +1,204 @@
+"""Faster decoding of large responses (e.g. `PlanResponse200`) into the same model objects as `from_dict()`
+
+The generated `from_dict()` methods copy every input dict, pop each key and import the nested models on every call.
+Instead, this module compiles one specialised decoder per model on first use, based on the attrs fields and type hints
+of the model and the JSON keys read by its generated `from_dict()`, so it stays in sync when the client is generated
+again. Models that can't be handled are decoded by their own `from_dict()`.
+
+The body is parsed with orjson if it is installed (the `speedups` extra), otherwise with the json module.
+
+Example:
+    from motis_api_client import fast_decode
+    from motis_api_client.api.routing import plan
+    from motis_api_client.models import PlanResponse200
+
+    response = fast_decode.sync_detailed(plan, PlanResponse200, client=client, from_place=a, to_place=b)
+"""
+
+import datetime
+import inspect
+import re
+import types
+import typing
+from collections.abc import Callable, Mapping
+from enum import Enum
+from http import HTTPStatus
+from typing import Any, TypeVar
+
+import attrs
+import httpx
+
+from . import models
+from .client import AuthenticatedClient, Client
+from .types import UNSET, Response, Unset
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+T = TypeVar("T")
+
+# `field = ...d.pop("jsonKey"...` in the generated from_dict(), the local variable can have a leading underscore
+_pop_pattern = re.compile(r'^ +_?(\w+) = .*\bd\.pop\("([^"]+)"', re.MULTILINE)
+
+# globals of all compiled decoders, every model has its decoder as `_decode_<name>`
+_namespace: dict[str, Any] = {"_UNSET": UNSET, "_fromisoformat": datetime.datetime.fromisoformat}
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def loads(content: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _json_keys(cls: type) -> dict[str, str]:
+    """field name: JSON key, as in the generated from_dict()"""
+    try:
+        source = inspect.getsource(cls.from_dict)
+    except (OSError, TypeError) as e:
+        raise _Unsupported(f"no source of {cls.__name__}.from_dict()") from e
+    keys = dict(_pop_pattern.findall(source))
+    fields = [field.name for field in attrs.fields(cls) if field.name != "additional_properties"]
+    if sorted(keys) != sorted(fields):
+        raise _Unsupported(f"unknown JSON keys of {cls.__name__}")
+    return keys
+
+
+def _expression(tp: Any, value: str, depth: int = 0) -> str | None:
+    """code converting the JSON `value` into `tp`, or None if it can be used as it is"""
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+    if tp in (str, int, float, bool) or tp is Any:
+        return None
+    if tp is datetime.datetime:
+        return f"_fromisoformat({value})"
+    if origin is list:
+        item = _expression(args[0], f"_{depth}", depth + 1)
+        return None if item is None else f"[{item} for _{depth} in {value}]"
+    if origin is dict and _expression(args[1], "_", depth + 1) is None:
+        return None
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        # a dict lookup instead of Enum.__call__(), which is surprisingly slow
+        _namespace[f"_enum_{tp.__name__}"] = tp
+        _namespace[f"_members_{tp.__name__}"] = tp._value2member_map_
+        members = f"_members_{tp.__name__}"
+        return f"({members}[{value}] if {value} in {members} else _enum_{tp.__name__}({value}))"
+    if attrs.has(tp) and hasattr(tp, "from_dict"):
+        _compile(tp)
+        return f"_decode_{tp.__name__}({value})"
+    raise _Unsupported(f"unsupported type {tp!r}")
+
+
+def _optional(tp: Any) -> Any | None:
+    """the type without Unset if it is `X | Unset`"""
+    if typing.get_origin(tp) in (types.UnionType, typing.Union) and Unset in typing.get_args(tp):
+        others = [arg for arg in typing.get_args(tp) if arg is not Unset]
+        if len(others) != 1:
+            raise _Unsupported(f"unsupported type {tp!r}")
+        return others[0]
+    return None
+
+
+def _source(cls: type) -> str:
+    name = cls.__name__
+    keys = _json_keys(cls)
+    hints = typing.get_type_hints(cls, localns=vars(models))
+    lines = [f"def _decode_{name}(d):"]
+    for field in attrs.fields(cls):
+        if field.name == "additional_properties":
+            continue
+        key = keys[field.name]
+        optional = _optional(hints[field.name])
+        if optional is None:
+            lines.append(f"    _v = d[{key!r}]")
+            expression = _expression(hints[field.name], "_v")
+        else:
+            lines.append(f"    _v = d.get({key!r}, _UNSET)")
+            expression = _expression(optional, "_v")
+            if expression is not None:
+                expression = f"_UNSET if _v is _UNSET else {expression}"
+        lines.append(f"    v_{field.name} = {expression or '_v'}")
+    arguments = ", ".join(f"{field.alias}=v_{field.name}" for field in attrs.fields(cls) if field.init)
+    lines.append(f"    obj = _cls_{name}({arguments})")
+    # like from_dict(), all keys without a field are kept in additional_properties
+    lines.append(f"    if not d.keys() <= _keys_{name}:")
+    lines.append(f"        obj.additional_properties = {{k: v for k, v in d.items() if k not in _keys_{name}}}")
+    lines.append("    return obj")
+    _namespace[f"_cls_{name}"] = cls
+    _namespace[f"_keys_{name}"] = frozenset(keys.values())
+    return "\n".join(lines)
+
+
+def _compile(cls: type) -> None:
+    name = f"_decode_{cls.__name__}"
+    if name in _namespace:
+        return
+    # set first, so that recursive models (e.g. Leg.alternatives) don't compile themselves again
+    _namespace[name] = cls.from_dict
+    try:
+        exec(_source(cls), _namespace)
+    except _Unsupported:
+        _namespace[name] = cls.from_dict
+
+
+def decoder(cls: type[T]) -> Callable[[Mapping[str, Any]], T]:
+    """The specialised decoder of a model, returning the same object as `cls.from_dict()`"""
+    _compile(cls)
+    return _namespace[f"_decode_{cls.__name__}"]
+
+
+def from_json(cls: type[T], content: bytes | str) -> T:
+    """Decode a JSON body (e.g. `response.content`) into a model"""
+    return decoder(cls)(loads(content))
+
+
+def build_response(
+    endpoint: types.ModuleType,
+    cls: type[T],
+    *,
+    client: AuthenticatedClient | Client,
+    response: httpx.Response,
+    decode: Callable[[type[T], bytes], Any] = from_json,
+) -> Response[Any]:
+    """Like the endpoint's own `_build_response()`, but decoding successful responses into `cls` with `decode`
+    (`from_json()`, or e.g. `lazy.from_json()`)"""
+    if response.status_code != 200:
+        return endpoint._build_response(client=client, response=response)
+    return Response(
+        status_code=HTTPStatus(response.status_code),
+        content=response.content,
+        headers=response.headers,
+        parsed=decode(cls, response.content),
+    )
+
+
+def sync_detailed(
+    endpoint: types.ModuleType,
+    cls: type[T],
+    *,
+    client: AuthenticatedClient | Client,
+    decode: Callable[[type[T], bytes], Any] = from_json,
+    **params: Any,
+) -> Response[Any]:
+    """Like `endpoint.sync_detailed(client=client, **params)`, but decoding the response with `build_response()`"""
+    response = client.get_httpx_client().request(**endpoint._get_kwargs(**params))
+    return build_response(endpoint, cls, client=client, response=response, decode=decode)
+
+
+async def asyncio_detailed(
+    endpoint: types.ModuleType,
+    cls: type[T],
+    *,
+    client: AuthenticatedClient | Client,
+    decode: Callable[[type[T], bytes], Any] = from_json,
+    **params: Any,
+) -> Response[Any]:
+    """Like `endpoint.asyncio_detailed(client=client, **params)`, but decoding the response with `build_response()`"""
+    response = await client.get_async_httpx_client().request(**endpoint._get_kwargs(**params))
+    return build_response(endpoint, cls, client=client, response=response, decode=decode)
@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+ASGI version of server.py with the same URLs and responses
+
+The upstream API is fetched by asyncio tasks instead of threads,
+so a single process can serve many slow clients at once:
+
+    uvicorn asgi:app
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import Headers
+
+from feeds import scheduler, snapshot_stores, start_refresh
+from responses import feed_response, feed_routes, metrics_response
+
+routes = feed_routes(snapshot_stores)
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            loop = asyncio.get_running_loop()
+            # the leader election runs in its own thread, so the task has to be handed over to the event loop
+            start_refresh(lambda: asyncio.run_coroutine_threadsafe(scheduler.run_async(), loop))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def send_response(send, status: int, headers: dict[str, str], body: bytes) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    if scope["path"] == "/metrics":
+        status, headers, body = metrics_response()
+        headers["Content-Length"] = str(len(body))
+        await send_response(send, status, headers, body)
+        return
+    if scope["path"] not in routes:
+        await send_response(send, 404, {"Content-Type": "text/plain", "Content-Length": "9"}, b"Not Found")
+        return
+    if scope["method"] not in ("GET", "HEAD"):
+        await send_response(send, 405, {"Allow": "GET, HEAD, OPTIONS", "Content-Length": "0"}, b"")
+        return
+
+    name, fmt, differential = routes[scope["path"]]
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    try:
+        since = int(query["since"][0])
+    except (KeyError, ValueError):
+        since = None
+    request_headers = Headers([(key.decode("latin-1"), value.decode("latin-1")) for key, value in scope["headers"]])
+
+    status, headers, body = feed_response(
+        name, snapshot_stores[name].current(), fmt, differential, since, request_headers
+    )
+    headers["Content-Length"] = str(len(body))
+    if scope["method"] == "HEAD":
+        body = b""
+    await send_response(send, status, headers, body)
@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+replay recorded trafficInfoList responses through the conversion pipeline and
+report the time and memory each stage needs, without any network access
+
+    python benchmark.py
+    python benchmark.py --scale 1 10 50 --repeat 10 vienna/examples/2026-02-20-23:09.json
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import vienna.conversion
+from snapshot import FeedSnapshot, feed_to_json
+from vienna.api import parse_response
+from vienna.conversion import disruptions_from_api, disruptions_to_proto
+
+current_dir = Path(__file__).parent
+
+
+def scaled_response(api_response: dict, scale: int) -> dict:
+    """
+    a copy of the response with every trafficInfo repeated `scale` times under a new name
+    """
+    scaled = copy.deepcopy(api_response)
+    infos = scaled["data"]["trafficInfos"]
+    scaled["data"]["trafficInfos"] = [
+        {**info, "name": f"{info['name']}#{i}"} if i else info
+        for i in range(scale)
+        for info in infos
+    ]
+    return scaled
+
+
+def pipeline(raw: bytes, stage) -> None:
+    api_response = stage("parse_response", parse_response, raw)
+    server_time, traffic_infos = stage("disruptions_from_api", disruptions_from_api, api_response)
+    vienna.conversion.entity_cache = {}
+    feed = stage("disruptions_to_proto (cold)", disruptions_to_proto, server_time, traffic_infos)
+    stage("disruptions_to_proto (warm)", disruptions_to_proto, server_time, traffic_infos)
+    stage("SerializeToString", feed.SerializeToString)
+    stage("MessageToJson", feed_to_json, feed)
+    stage("FeedSnapshot.from_feed", FeedSnapshot.from_feed, feed)
+
+
+def timings(raw: bytes) -> dict[str, float]:
+    results = {}
+
+    def stage(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        results[name] = time.perf_counter() - start
+        return result
+
+    pipeline(raw, stage)
+    return results
+
+
+def peak_memory(raw: bytes) -> dict[str, int]:
+    """
+    peak of the memory allocated by each stage (measured separately, as tracemalloc slows everything down)
+    """
+    results = {}
+
+    def stage(name, func, *args):
+        tracemalloc.start()
+        result = func(*args)
+        results[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result
+
+    pipeline(raw, stage)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("examples", nargs="*", type=Path,
+                        default=sorted((current_dir / "vienna" / "examples").glob("*.json")))
+    parser.add_argument("--scale", nargs="+", type=int, default=[1],
+                        help="also run with every trafficInfo repeated this many times")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for example in args.examples:
+        with example.open() as f:
+            api_response = json.load(f)
+        for scale in args.scale:
+            raw = json.dumps(scaled_response(api_response, scale)).encode()
+            num_infos = len(api_response["data"]["trafficInfos"]) * scale
+            # the conversion prints every unknown cause or unmatched stop, which we don't want to see here
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                runs = [timings(raw) for _ in range(args.repeat)]
+                peaks = peak_memory(raw)
+            print(f"{example.name} x{scale} ({num_infos} trafficInfos, {len(raw) / 1e6:.2f} MB)")
+            for name in runs[0]:
+                median = statistics.median(run[name] for run in runs)
+                print(f"  {name:30} {median * 1000:9.2f} ms {peaks[name] / 1e6:9.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
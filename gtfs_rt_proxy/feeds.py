@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Converts every new response of a source into a snapshot and publishes it,
+so that the servers (server.py and asgi.py) only need to serve the current snapshot.
+
+Every source has its own feed and all of them are also merged into one feed (`merged_feed_name`).
+"""
+import threading
+from typing import Callable
+
+import metrics
+from proto import gtfs_realtime_pb2
+from shared_cache import LeaderElection, SharedSnapshotStore, cache_dir
+from snapshot import FeedSnapshot, LocalSnapshotStore, encoded_key, encodings
+from sources import Scheduler, Source, merge_feeds
+from steiermark.source import SteiermarkSource
+from vienna.source import ViennaSource
+
+sources: list[Source] = [ViennaSource(), SteiermarkSource()]
+
+merged_feed_name = "all"
+
+if cache_dir is not None:
+    # all workers serve the same snapshots and only one of them fetches the upstream APIs
+    leader_election = LeaderElection(cache_dir)
+    snapshot_stores = {
+        name: SharedSnapshotStore(cache_dir / f"{name}.sqlite")
+        for name in [source.name for source in sources] + [merged_feed_name]
+    }
+else:
+    leader_election = None
+    snapshot_stores = {
+        name: LocalSnapshotStore()
+        for name in [source.name for source in sources] + [merged_feed_name]
+    }
+
+publish_lock = threading.Lock()
+# the last feed of every source, to build the merged feed
+latest_feeds: dict[str, gtfs_realtime_pb2.FeedMessage] = {}
+
+
+def publish_snapshot(name: str, feed: gtfs_realtime_pb2.FeedMessage) -> None:
+    store = snapshot_stores[name]
+    with metrics.snapshot_seconds.time(feed=name):
+        snapshot = FeedSnapshot.from_feed(feed, previous=store.current())
+    store.publish(snapshot)
+
+    for fmt in ("pb", "json"):
+        metrics.feed_bytes.set(len(snapshot.bodies[fmt]), feed=name, format=fmt, encoding="identity")
+        for encoding in encodings:
+            if encoded_key(fmt, encoding) in snapshot.bodies:
+                metrics.feed_bytes.set(len(snapshot.bodies[encoded_key(fmt, encoding)]), feed=name, format=fmt,
+                                       encoding=encoding)
+    for entity_type in ("alert", "trip_update", "vehicle"):
+        count = sum(1 for entity in feed.entity if entity.HasField(entity_type))
+        metrics.feed_entities.set(count, feed=name, type=entity_type)
+
+
+def publish_feed(source: Source, feed: gtfs_realtime_pb2.FeedMessage) -> None:
+    # build the new snapshots right after each refresh, so that no request has to wait for the conversion
+    with publish_lock:
+        publish_snapshot(source.name, feed)
+        latest_feeds[source.name] = feed
+        publish_snapshot(merged_feed_name, merge_feeds(latest_feeds))
+
+
+scheduler = Scheduler(sources, publish_feed)
+
+
+def start_refresh(start_fetching: Callable[[], None]) -> None:
+    """
+    start fetching the upstream APIs in this process,
+    or only once this worker becomes the leader if the snapshots are shared
+    """
+    if leader_election is not None:
+        leader_election.start(start_fetching)
+    else:
+        start_fetching()
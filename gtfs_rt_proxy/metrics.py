@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+minimal Prometheus metrics, rendered in the text exposition format at /metrics
+
+The metrics are kept per process. When running multiple gunicorn workers with GTFS_RT_PROXY_CACHE_DIR,
+only the leader fetches and converts, so the fetch and conversion metrics are only reported by it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type: str
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.lock = threading.Lock()
+        self.values: dict[tuple[tuple[str, str], ...], float] = {}
+        registry.append(self)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}" for labels, value in self.values.items()]
+
+    def render(self) -> str:
+        with self.lock:
+            lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self.samples()
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...] = default_buckets):
+        super().__init__(name, documentation)
+        self.buckets = buckets + (float("inf"),)
+        # labels: (count per bucket, sum)
+        self.histograms: dict[tuple[tuple[str, str], ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts, total = self.histograms.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.histograms[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self.histograms.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total!r}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {counts[-1]}")
+        return lines
+
+
+registry: list[Metric] = []
+
+
+def render() -> bytes:
+    return ("\n".join(metric.render() for metric in registry) + "\n").encode()
+
+
+fetch_seconds = Histogram("gtfs_rt_proxy_fetch_seconds", "time to fetch a source from upstream")
+fetch_failures = Counter("gtfs_rt_proxy_fetch_failures_total", "failed upstream fetches")
+consecutive_failures = Gauge(
+    "gtfs_rt_proxy_consecutive_failures", "failed fetches since the last success, from 3 on only retried once per refresh interval"
+)
+last_success = Gauge("gtfs_rt_proxy_last_success_timestamp_seconds", "when the data of the current feed was fetched")
+conversion_seconds = Histogram("gtfs_rt_proxy_conversion_seconds", "time to convert the fetched data into a FeedMessage")
+snapshot_seconds = Histogram("gtfs_rt_proxy_snapshot_seconds", "time to serialize a FeedMessage into all bodies")
+feed_bytes = Gauge("gtfs_rt_proxy_feed_bytes", "size of the current full feed")
+feed_entities = Gauge("gtfs_rt_proxy_feed_entities", "entities in the current feed")
+responses = Counter("gtfs_rt_proxy_responses_total", "feed responses by status (304 if the client's copy is current)")
+entity_cache = Counter("gtfs_rt_proxy_entity_cache_total", "Vienna alerts reused from the last conversion or built again")
+unmatched = Counter("gtfs_rt_proxy_unmatched_total", "Vienna lines and stops without a GTFS ID")
+unknown_classification = Counter(
+    "gtfs_rt_proxy_unknown_classification_total", "Vienna alerts without a known cause or effect"
+)
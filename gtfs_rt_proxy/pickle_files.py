@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+the indexes and saved responses that are kept as pickle files
+"""
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+def atomic_pickle_dump(path: Path, data: Any) -> None:
+    """
+    Write to a temporary file in the same directory first and then replace the file,
+    so that other processes (or a later run after a crash) never read a partially written file.
+    """
+    with tempfile.NamedTemporaryFile("wb", dir=path.parent, delete=False) as f:
+        try:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    try:
+        # readable by all workers, even if they run as another user
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+class ReloadingPickle(Generic[T]):
+    """
+    a pickle file that is loaded on first use and reloaded if the file changed
+    """
+
+    def __init__(self, path: Path, load: Callable[..., T]):
+        self.path = path
+        # called with the unpickled tuple as arguments
+        self.load = load
+        self._value: T | None = None
+        self._mtime: int | None = None
+
+    def get(self) -> T | None:
+        """
+        None if the file was never written
+        """
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self.path.open("rb") as f:
+                self._value = self.load(*pickle.load(f))
+            self._mtime = mtime
+        return self._value
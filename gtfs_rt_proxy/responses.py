@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+the HTTP responses of the proxy, independent of the server (Flask or ASGI) that sends them
+"""
+from werkzeug.datastructures import Headers
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, quote_etag
+
+import metrics
+from snapshot import FeedSnapshot
+
+
+def feed_routes(names) -> dict[str, tuple[str, str, bool]]:
+    """
+    path: (feed name, format, differential) for all feeds
+    """
+    routes = {}
+    for name in names:
+        routes[f"/{name}-gtfs-rt.pb"] = (name, "pb", False)
+        routes[f"/{name}-gtfs-rt.json"] = (name, "json", False)
+        # differential feeds with all changes since the version in the X-Snapshot-Version header of an earlier
+        # response, e.g. /vienna-gtfs-rt-differential.pb?since=1767361168000
+        routes[f"/{name}-gtfs-rt-differential.pb"] = (name, "pb", True)
+        routes[f"/{name}-gtfs-rt-differential.json"] = (name, "json", True)
+    return routes
+
+
+content_types = {
+    "pb": "application/x-protobuf",
+    "json": "application/json",
+}
+
+
+def feed_response(
+    name: str, snapshot: FeedSnapshot | None, fmt: str, differential: bool, since: int | None,
+    request_headers: Headers
+) -> tuple[int, dict[str, str], bytes]:
+    """
+    status, headers and body of the response,
+    answering If-None-Match and If-Modified-Since with an empty 304 response
+    and compressed with the best of the precompressed versions that Accept-Encoding allows
+    """
+    status, headers, body = _feed_response(snapshot, fmt, differential, since, request_headers)
+    metrics.responses.inc(feed=name, format=fmt, status=str(status))
+    return status, headers, body
+
+
+def metrics_response() -> tuple[int, dict[str, str], bytes]:
+    return 200, {"Content-Type": metrics.content_type}, metrics.render()
+
+
+def _feed_response(
+    snapshot: FeedSnapshot | None, fmt: str, differential: bool, since: int | None, request_headers: Headers
+) -> tuple[int, dict[str, str], bytes]:
+    if snapshot is None:
+        return 503, {"Content-Type": "text/plain", "Retry-After": "60"}, b"no snapshot has been published yet"
+    key = snapshot.differential(since, fmt) if differential else fmt
+    key, encoding = snapshot.encoded(key, parse_accept_header(request_headers.get("Accept-Encoding")).quality)
+    etag = snapshot.etags[key]
+    headers = {
+        "Content-Type": content_types[fmt],
+        "Vary": "Accept-Encoding",
+        "X-Snapshot-Version": str(snapshot.version),
+        "ETag": quote_etag(etag),
+        "Last-Modified": http_date(snapshot.last_modified),
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    if "If-None-Match" in request_headers:
+        not_modified = parse_etags(request_headers["If-None-Match"]).contains_weak(etag)
+    elif "If-Modified-Since" in request_headers:
+        modified_since = parse_date(request_headers["If-Modified-Since"])
+        not_modified = modified_since is not None and snapshot.last_modified <= modified_since
+    else:
+        not_modified = False
+    if not_modified:
+        return 304, headers, b""
+    return 200, headers, snapshot.body(key)
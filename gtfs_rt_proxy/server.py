@@ -3,37 +3,31 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
-from flask import Flask, Response
-from google.protobuf.json_format import MessageToJson
+from flask import Flask, Response, request
 
-from vienna.api import vienna_disruptions_api
-from vienna.conversion import disruptions_from_api, disruptions_to_proto
-from proto import gtfs_realtime_pb2
+from feeds import scheduler, snapshot_stores, start_refresh
+from responses import feed_response, feed_routes, metrics_response
 
+start_refresh(scheduler.start)
 
-def feed_pb() -> gtfs_realtime_pb2.FeedMessage:
-    api_response = vienna_disruptions_api.current_disruptions()
-    server_time, traffic_infos = disruptions_from_api(api_response)
-    return disruptions_to_proto(server_time, traffic_infos)
+app = Flask(__name__)
 
 
-app = Flask(__name__)
+def feed_view(name: str, fmt: str, differential: bool):
+    def view():
+        status, headers, body = feed_response(
+            name, snapshot_stores[name].current(), fmt, differential, request.args.get("since", type=int), request.headers
+        )
+        return Response(body, status=status, headers=headers)
+
+    return view
 
 
-@app.route("/vienna-gtfs-rt.pb")
-def vienna_gtfs_rt():
-    # TODO: Add ETag header
-    feed = feed_pb()
-    body = feed.SerializeToString()
-    return Response(body, headers={"Content-Type": "application/x-protobuf"})
+for path, (name, fmt, differential) in feed_routes(snapshot_stores).items():
+    app.add_url_rule(path, endpoint=path, view_func=feed_view(name, fmt, differential))
 
 
-@app.route("/vienna-gtfs-rt.json")
-def vienna_gtfs_rt_json():
-    feed = feed_pb()
-    body = MessageToJson(
-        feed,
-        preserving_proto_field_name=True,
-        use_integers_for_enums=True
-    )
-    return Response(body, headers={"Content-Type": "application/json"})
+@app.route("/metrics")
+def metrics_view():
+    status, headers, body = metrics_response()
+    return Response(body, status=status, headers=headers)
@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+import fcntl
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from snapshot import FeedSnapshot
+
+# writable directory for the shared snapshots and everything else kept between restarts, if it is set
+cache_dir = Path(os.environ["GTFS_RT_PROXY_CACHE_DIR"]) if "GTFS_RT_PROXY_CACHE_DIR" in os.environ else None
+
+
+class SharedSnapshotStore:
+    """
+    Lets all gunicorn workers serve the same snapshot.
+
+    Only the worker that won the LeaderElection fetches from the upstream API and
+    writes each new snapshot into an SQLite database in one transaction.
+    All other workers just load the bodies from there whenever the database changes.
+    The entity hashes of the previous versions are only loaded once a worker has to build a differential feed.
+    """
+
+    def __init__(self, database_path: Path):
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS bodies (fmt TEXT PRIMARY KEY, version INTEGER, timestamp INTEGER, body BLOB)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS history (version INTEGER PRIMARY KEY, hashes BLOB)")
+        self.data_version = None
+        self.snapshot: FeedSnapshot | None = None
+
+    def publish(self, snapshot: FeedSnapshot) -> None:
+        history = snapshot.history
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute("DELETE FROM bodies")
+            self.conn.executemany(
+                "INSERT INTO bodies (fmt, version, timestamp, body) VALUES (?, ?, ?, ?)",
+                [(fmt, snapshot.version, snapshot.timestamp, body) for fmt, body in snapshot.bodies.items()]
+            )
+            # the older versions are already stored, only the new one is added
+            stored = {version for version, in self.conn.execute("SELECT version FROM history")}
+            self.conn.executemany(
+                "DELETE FROM history WHERE version = ?", [(version,) for version in stored - history.keys()]
+            )
+            self.conn.executemany(
+                "INSERT INTO history (version, hashes) VALUES (?, ?)",
+                [
+                    (version, pickle.dumps(hashes, protocol=pickle.HIGHEST_PROTOCOL))
+                    for version, hashes in history.items() if version not in stored
+                ]
+            )
+            self.conn.execute("COMMIT")
+            # data_version only changes for commits of other connections, so we keep our own snapshot directly
+            self.snapshot = snapshot
+
+    def current(self) -> FeedSnapshot | None:
+        with self.lock:
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self.data_version:
+                rows = self.conn.execute("SELECT fmt, version, timestamp, body FROM bodies").fetchall()
+                if rows:
+                    _, version, timestamp, _ = rows[0]
+                    self.snapshot = FeedSnapshot(
+                        version, timestamp, {fmt: body for fmt, _, _, body in rows},
+                        load_history=functools.partial(self.load_history, version)
+                    )
+                self.data_version = data_version
+            return self.snapshot
+
+    def load_history(self, version: int) -> dict[int, dict[str, bytes]]:
+        """
+        the entity hashes of the given version and the ones before it
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT version, hashes FROM history WHERE version <= ?", (version,)).fetchall()
+        return {row_version: pickle.loads(hashes) for row_version, hashes in rows}
+
+
+
+class LeaderElection:
+    """
+    Only one of the processes sharing the directory holds the lock file and becomes the leader.
+    If it exits, another one takes over within `interval` seconds.
+    """
+
+    def __init__(self, directory: Path, interval: float = 30):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.lock_path = directory / "leader.lock"
+        self.interval = interval
+        self.lock_file = None
+
+    def start(self, on_elected: Callable[[], None]) -> None:
+        threading.Thread(target=self._elect, args=(on_elected,), name="leader-election", daemon=True).start()
+
+    def _elect(self, on_elected: Callable[[], None]) -> None:
+        # flock() locks belong to the open file, so it must be opened after gunicorn forked the worker
+        # the file is kept open, the lock is released when the leader process exits
+        self.lock_file = open(self.lock_path, "w")
+        while True:
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(self.interval)
+        print("this worker is now fetching the upstream API")
+        on_elected()
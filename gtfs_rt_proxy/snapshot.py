@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import gzip
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from google.protobuf.json_format import MessageToJson
+
+from proto import gtfs_realtime_pb2
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# number of previous versions a differential feed can be requested for
+history_length = 12
+
+# Content-Encodings every body is compressed with, in order of preference
+encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+# smaller bodies are always sent uncompressed, as compressing them wouldn't save anything
+min_compressed_size = 1000
+
+
+def feed_to_json(feed: gtfs_realtime_pb2.FeedMessage) -> bytes:
+    return MessageToJson(
+        feed,
+        preserving_proto_field_name=True,
+        use_integers_for_enums=True
+    ).encode()
+
+
+def differential_feed(
+    feed: gtfs_realtime_pb2.FeedMessage, entity_hashes: dict[str, bytes], previous_hashes: dict[str, bytes]
+) -> gtfs_realtime_pb2.FeedMessage:
+    diff = gtfs_realtime_pb2.FeedMessage()
+    diff.header.CopyFrom(feed.header)
+    diff.header.incrementality = diff.header.DIFFERENTIAL
+    for entity in feed.entity:
+        if previous_hashes.get(entity.id) != entity_hashes[entity.id]:
+            diff.entity.append(entity)
+    for entity_id in previous_hashes.keys() - entity_hashes.keys():
+        deleted = diff.entity.add()
+        deleted.id = entity_id
+        deleted.is_deleted = True
+    return diff
+
+
+def differential_key(since: int, fmt: str) -> str:
+    return f"diff-{since}.{fmt}"
+
+
+def encoded_key(key: str, encoding: str) -> str:
+    return f"{key}.{encoding}"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    # the bodies are only compressed once per snapshot, so the best compression is affordable
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    # without the current time in the header, the same feed gets the same body and ETag
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class FeedSnapshot:
+    """
+    A FeedMessage serialized once into every format we serve.
+    The bodies are never modified afterward, so requests only have to look them up.
+
+    The full dataset is serialized (and compressed with each of the `encodings`) right away.
+    Differential feeds against the previous versions in `history` are only built (and compressed)
+    when they are requested for the first time and are then kept with the snapshot,
+    as most clients only ask for the changes since the last one or two versions.
+    """
+
+    def __init__(
+        self, version: int, timestamp: int, bodies: dict[str, bytes],
+        history: dict[int, dict[str, bytes]] | None = None,
+        load_history: Callable[[], dict[int, dict[str, bytes]]] | None = None,
+        feed: gtfs_realtime_pb2.FeedMessage | None = None
+    ):
+        self.version = version
+        # when the content of the feed last changed, usually the timestamp in its header
+        self.timestamp = timestamp
+        self.last_modified = datetime.fromtimestamp(self.timestamp, tz=timezone.utc)
+        # the bodies built right away, the differential ones are added to `built` once they are requested
+        self.bodies = bodies
+        self.built: dict[str, bytes] = {}
+        self.etags = {
+            fmt: hashlib.sha256(body).hexdigest() for fmt, body in self.bodies.items()
+        }
+        # hashes of all entities by id for this and the previous versions,
+        # loaded with `load_history` when it is needed for the first time if it isn't passed
+        self._history = history
+        self._load_history = load_history
+        # only kept by the process that built the snapshot, otherwise it is parsed from the pb body again
+        self._feed = feed
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_feed(cls, feed: gtfs_realtime_pb2.FeedMessage, previous: "FeedSnapshot | None" = None) -> "FeedSnapshot":
+        version = time.time_ns() // 1_000_000
+        entity_hashes = {
+            entity.id: hashlib.sha256(entity.SerializeToString(deterministic=True)).digest()
+            for entity in feed.entity
+        }
+        history = {} if previous is None else dict(previous.history)
+        history[version] = entity_hashes
+        for old_version in sorted(history)[:-history_length]:
+            del history[old_version]
+
+        bodies = {
+            "pb": feed.SerializeToString(),
+            "json": feed_to_json(feed),
+        }
+        for key, body in list(bodies.items()):
+            if len(body) >= min_compressed_size:
+                for encoding in encodings:
+                    bodies[encoded_key(key, encoding)] = compress(body, encoding)
+
+        timestamp = feed.header.timestamp
+        if previous is not None and timestamp <= previous.timestamp:
+            # the same data converted again (e.g. with new mappings) keeps the time of the data in the header,
+            # but if the body changed, Last-Modified has to change as well for clients only sending If-Modified-Since
+            if bodies["pb"] == previous.bodies["pb"]:
+                timestamp = previous.timestamp
+            else:
+                timestamp = max(int(time.time()), previous.timestamp + 1)
+
+        return cls(version, timestamp, bodies, history=history, feed=feed)
+
+    @property
+    def history(self) -> dict[int, dict[str, bytes]]:
+        with self._lock:
+            if self._history is None:
+                self._history = self._load_history() if self._load_history is not None else {}
+            return self._history
+
+    def body(self, key: str) -> bytes:
+        if key in self.bodies:
+            return self.bodies[key]
+        return self.built[key]
+
+    def _add(self, key: str, body: bytes) -> None:
+        self.etags[key] = hashlib.sha256(body).hexdigest()
+        self.built[key] = body
+
+    def _build_differential(self, since: int, fmt: str) -> None:
+        feed = self._feed
+        if feed is None:
+            feed = gtfs_realtime_pb2.FeedMessage.FromString(self.bodies["pb"])
+        diff = differential_feed(feed, self.history[self.version], self.history[since])
+        key = differential_key(since, fmt)
+        self._add(key, diff.SerializeToString() if fmt == "pb" else feed_to_json(diff))
+
+    def differential(self, since: int | None, fmt: str) -> str:
+        """
+        key of the body with all changes since the given version (built now if it wasn't requested before),
+        falls back to the full dataset if the version is unknown or too old
+        """
+        if since is None:
+            return fmt
+        key = differential_key(since, fmt)
+        if key in self.built:
+            return key
+        with self._lock:
+            if key not in self.built:
+                if since not in self.history or self.version not in self.history:
+                    return fmt
+                self._build_differential(since, fmt)
+        return key
+
+    def encoded(self, key: str, accepted: Callable[[str], float]) -> tuple[str, str | None]:
+        """
+        key and Content-Encoding of the best compressed version of the body the client accepts,
+        `accepted` returns the quality the client gave an encoding in Accept-Encoding
+
+        The full dataset is compressed right away, differential feeds only once an encoding is requested.
+        """
+        for encoding in encodings:
+            if accepted(encoding) <= 0:
+                continue
+            compressed_key = encoded_key(key, encoding)
+            if compressed_key in self.bodies or compressed_key in self.built:
+                return compressed_key, encoding
+            if key in self.built and len(self.built[key]) >= min_compressed_size:
+                with self._lock:
+                    if compressed_key not in self.built:
+                        self._add(compressed_key, compress(self.built[key], encoding))
+                return compressed_key, encoding
+        return key, None
+
+
+class LocalSnapshotStore:
+    """
+    Keeps the latest snapshot in the memory of this process.
+    """
+
+    def __init__(self):
+        self.snapshot: FeedSnapshot | None = None
+
+    def publish(self, snapshot: FeedSnapshot) -> None:
+        self.snapshot = snapshot
+
+    def current(self) -> FeedSnapshot | None:
+        return self.snapshot
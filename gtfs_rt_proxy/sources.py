@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+the upstream sources of the proxy
+
+Every source fetches the data of one operator, normalizes it and converts it into a FeedMessage.
+The Scheduler refreshes all sources (each with its own interval) and hands every new feed to `publish`,
+so a source doesn't have to care about caching, retries or serialization.
+"""
+import abc
+import asyncio
+import datetime
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+import httpx
+
+import metrics
+from proto import gtfs_realtime_pb2
+
+user_agent = "Basic-GTFS-RT-Proxy (https://git.lw1.at/lukas/motis-git-annex/src/branch/synced/main/gtfs_rt_proxy)"
+
+# after a failed refresh, retry after 15s, 30s, 60s, ... (but not later than the normal refresh interval),
+# so that a single failed request doesn't leave the feed outdated for a whole interval
+min_retry_delay = datetime.timedelta(seconds=15)
+# after this many failures in a row, the upstream is considered down
+# and only requested once per normal refresh interval until it works again, while the last good data is still served
+max_quick_retries = 3
+
+# how often to check if a source has to convert its last data again (e.g. because the mappings changed)
+rebuild_check_interval = 30
+
+
+def next_refresh_delay(failures: int, max_age: datetime.timedelta) -> datetime.timedelta:
+    if failures == 0 or failures >= max_quick_retries:
+        return max_age
+    return min(min_retry_delay * 2 ** (failures - 1), max_age)
+
+
+class Source(abc.ABC):
+    # used in the URLs of the feed (/<name>-gtfs-rt.pb)
+    name: str
+    max_age = datetime.timedelta(minutes=4, seconds=50)
+
+    @abc.abstractmethod
+    def fetch(self) -> Any:
+        ...
+
+    async def fetch_async(self, client: httpx.AsyncClient) -> Any:
+        """
+        the same as fetch() for the ASGI server, by default in a thread
+        """
+        return await asyncio.to_thread(self.fetch)
+
+    def normalize(self, raw: Any) -> Any:
+        """
+        turn the fetched data into the input of to_proto(), which is kept for rebuilds
+        """
+        return raw
+
+    @abc.abstractmethod
+    def to_proto(self, data: Any) -> gtfs_realtime_pb2.FeedMessage:
+        ...
+
+    def needs_rebuild(self) -> bool:
+        """
+        if the last data has to be converted again, without fetching it again
+        """
+        return False
+
+    def restore(self) -> tuple[Any, datetime.timedelta] | None:
+        """
+        the fetched data saved by an earlier run and its age,
+        so that a feed can be published right after a restart without waiting for the upstream
+        """
+        return None
+
+
+def merge_feeds(feeds: dict[str, gtfs_realtime_pb2.FeedMessage]) -> gtfs_realtime_pb2.FeedMessage:
+    """
+    all entities of the feeds in one FeedMessage, with the name of the source in front of the entity IDs
+    """
+    merged = gtfs_realtime_pb2.FeedMessage()
+    merged.header.gtfs_realtime_version = "2.0"
+    merged.header.timestamp = max((feed.header.timestamp for feed in feeds.values()), default=0)
+    for name, feed in feeds.items():
+        for entity in feed.entity:
+            merged_entity = merged.entity.add()
+            merged_entity.CopyFrom(entity)
+            merged_entity.id = f"{name}:{entity.id}"
+    return merged
+
+
+class Scheduler:
+    """
+    Refreshes all sources from one thread (or one asyncio task), each whenever its data is older than its max_age.
+    The sources are fetched in parallel, so a slow upstream doesn't delay the others.
+    """
+
+    def __init__(self, sources: list[Source], publish: Callable[[Source, gtfs_realtime_pb2.FeedMessage], None]):
+        self.sources = sources
+        self.publish = publish
+        # the last normalized data of each source
+        self.data: dict[str, Any] = {}
+        self.failures = {source.name: 0 for source in sources}
+        self.next_refresh = {source.name: 0.0 for source in sources}
+
+    def restore(self) -> None:
+        for source in self.sources:
+            try:
+                restored = source.restore()
+                if restored is None:
+                    continue
+                raw, age = restored
+                self.process(source, raw)
+            except Exception as e:
+                print(f"failed to restore {source.name}: {e!r}")
+                continue
+            print(f"restored {source.name} from {age.total_seconds():.0f}s ago")
+            metrics.last_success.set(time.time() - age.total_seconds(), source=source.name)
+            # only fetch again once the restored data would have been refreshed anyway
+            remaining = max(source.max_age - age, datetime.timedelta())
+            self.next_refresh[source.name] = time.monotonic() + remaining.total_seconds()
+
+    def process(self, source: Source, raw: Any) -> None:
+        with metrics.conversion_seconds.time(source=source.name):
+            data = source.normalize(raw)
+            feed = source.to_proto(data)
+        self.data[source.name] = data
+        self.publish(source, feed)
+
+    def rebuild(self, source: Source) -> None:
+        try:
+            if source.name in self.data and source.needs_rebuild():
+                with metrics.conversion_seconds.time(source=source.name):
+                    feed = source.to_proto(self.data[source.name])
+                self.publish(source, feed)
+        except Exception as e:
+            print(f"failed to rebuild {source.name}: {e!r}")
+
+    def refreshed(self, source: Source, error: Exception | None) -> None:
+        if error is None:
+            self.failures[source.name] = 0
+            metrics.last_success.set(time.time(), source=source.name)
+        else:
+            self.failures[source.name] += 1
+            metrics.fetch_failures.inc(source=source.name)
+            print(f"failed to refresh {source.name} ({self.failures[source.name]}x): {error!r}")
+            if self.failures[source.name] == max_quick_retries:
+                print(f"{source.name} seems to be down, only retrying every {source.max_age}")
+        metrics.consecutive_failures.set(self.failures[source.name], source=source.name)
+        delay = next_refresh_delay(self.failures[source.name], source.max_age)
+        self.next_refresh[source.name] = time.monotonic() + delay.total_seconds()
+
+    def refresh(self, source: Source) -> None:
+        try:
+            with metrics.fetch_seconds.time(source=source.name):
+                raw = source.fetch()
+            self.process(source, raw)
+        except Exception as e:
+            self.refreshed(source, e)
+        else:
+            self.refreshed(source, None)
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="scheduler", daemon=True).start()
+
+    def _run(self) -> None:
+        self.restore()
+        running: dict[str, Future] = {}
+        next_rebuild_check = time.monotonic() + rebuild_check_interval
+        with ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix="refresh") as executor:
+            while True:
+                now = time.monotonic()
+                for name, future in list(running.items()):
+                    if future.done():
+                        del running[name]
+                for source in self.sources:
+                    if source.name not in running and now >= self.next_refresh[source.name]:
+                        running[source.name] = executor.submit(self.refresh, source)
+                if now >= next_rebuild_check:
+                    for source in self.sources:
+                        if source.name not in running:
+                            running[source.name] = executor.submit(self.rebuild, source)
+                    next_rebuild_check = now + rebuild_check_interval
+
+                # sleep until the next refresh is due or a running one finished
+                due = [self.next_refresh[source.name] for source in self.sources if source.name not in running]
+                timeout = max(0.0, min(due + [next_rebuild_check]) - time.monotonic())
+                if running:
+                    wait(running.values(), timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(timeout)
+
+    async def run_async(self) -> None:
+        """
+        the same as start(), but as an asyncio task fetching with httpx
+        """
+        await asyncio.to_thread(self.restore)
+        async with httpx.AsyncClient(headers={"User-Agent": user_agent}) as client:
+            await asyncio.gather(*(self._refresh_loop_async(source, client) for source in self.sources))
+
+    async def _refresh_loop_async(self, source: Source, client: httpx.AsyncClient) -> None:
+        next_rebuild_check = time.monotonic() + rebuild_check_interval
+        while True:
+            if time.monotonic() >= self.next_refresh[source.name]:
+                try:
+                    with metrics.fetch_seconds.time(source=source.name):
+                        raw = await source.fetch_async(client)
+                    # the conversion would block the event loop for a while
+                    await asyncio.to_thread(self.process, source, raw)
+                except Exception as e:
+                    self.refreshed(source, e)
+                else:
+                    self.refreshed(source, None)
+            if time.monotonic() >= next_rebuild_check:
+                await asyncio.to_thread(self.rebuild, source)
+                next_rebuild_check = time.monotonic() + rebuild_check_interval
+            await asyncio.sleep(max(0.0, min(self.next_refresh[source.name], next_rebuild_check) - time.monotonic()))
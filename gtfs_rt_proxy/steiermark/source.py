@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+the TripUpdates of the five Steiermark (Verbundlinie) GTFS-RT feeds merged into one feed
+
+Every feed is fetched in parallel with a short timeout. If one of them fails or is too slow,
+its last good response is used again, so one slow port never delays the whole feed.
+"""
+import asyncio
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+
+from proto import gtfs_realtime_pb2
+from sources import Source, user_agent
+
+feed_urls = [
+    "https://efa.verbundlinie.at:7790/trips",
+    "https://efa.verbundlinie.at:7792/trips",
+    "https://efa.verbundlinie.at:7794/trips",
+    "https://efa.verbundlinie.at:7796/trips",
+    "https://efa.verbundlinie.at:7798/trips",
+]
+
+fetch_timeout = 15
+# the last good response of a feed is used for at most this long
+max_stale_age = datetime.timedelta(minutes=5)
+
+session = requests.Session()
+session.headers.update({
+    "User-Agent": user_agent
+})
+
+
+def parse_feed(body: bytes) -> gtfs_realtime_pb2.FeedMessage:
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.ParseFromString(body)
+    return feed
+
+
+def entity_timestamp(entity: gtfs_realtime_pb2.FeedEntity, feed: gtfs_realtime_pb2.FeedMessage) -> int:
+    if entity.HasField("trip_update") and entity.trip_update.timestamp:
+        return entity.trip_update.timestamp
+    return feed.header.timestamp
+
+
+def merge_trip_feeds(feeds: list[gtfs_realtime_pb2.FeedMessage]) -> gtfs_realtime_pb2.FeedMessage:
+    """
+    all entities of the feeds, if an entity ID is in more than one feed the most recent entity is kept
+    """
+    entities: dict[str, tuple[int, gtfs_realtime_pb2.FeedEntity]] = {}
+    for feed in feeds:
+        for entity in feed.entity:
+            timestamp = entity_timestamp(entity, feed)
+            if entity.id not in entities or timestamp > entities[entity.id][0]:
+                entities[entity.id] = (timestamp, entity)
+
+    merged = gtfs_realtime_pb2.FeedMessage()
+    merged.header.gtfs_realtime_version = "2.0"
+    merged.header.timestamp = max((feed.header.timestamp for feed in feeds), default=0)
+    for _, entity in entities.values():
+        merged.entity.append(entity)
+    return merged
+
+
+class SteiermarkSource(Source):
+    name = "steiermark"
+    # the same as `update_interval` in config.yml, MOTIS fetches the feed every minute
+    # and before the proxy, MOTIS requested each of the five upstream feeds just as often
+    max_age = datetime.timedelta(seconds=60)
+
+    def __init__(self, urls: list[str] = feed_urls):
+        self.urls = urls
+        # url: (time.monotonic() of the response, feed)
+        self.last_responses: dict[str, tuple[float, gtfs_realtime_pb2.FeedMessage]] = {}
+
+    def fetch_feed(self, url: str) -> gtfs_realtime_pb2.FeedMessage:
+        r = session.get(url, timeout=fetch_timeout)
+        r.raise_for_status()
+        return parse_feed(r.content)
+
+    async def fetch_feed_async(self, client: httpx.AsyncClient, url: str) -> gtfs_realtime_pb2.FeedMessage:
+        r = await client.get(url, timeout=fetch_timeout)
+        r.raise_for_status()
+        return parse_feed(r.content)
+
+    def collect(
+        self, results: list[gtfs_realtime_pb2.FeedMessage | BaseException]
+    ) -> list[gtfs_realtime_pb2.FeedMessage]:
+        now = time.monotonic()
+        feeds = []
+        for url, result in zip(self.urls, results):
+            if isinstance(result, BaseException):
+                print(f"failed to fetch {url}: {result!r}")
+            else:
+                self.last_responses[url] = (now, result)
+            if url in self.last_responses:
+                fetched, feed = self.last_responses[url]
+                if now - fetched <= max_stale_age.total_seconds():
+                    feeds.append(feed)
+        if not feeds:
+            raise RuntimeError("none of the Steiermark feeds are available")
+        return feeds
+
+    def fetch(self) -> list[gtfs_realtime_pb2.FeedMessage]:
+        def fetch_feed(url: str) -> gtfs_realtime_pb2.FeedMessage | BaseException:
+            try:
+                return self.fetch_feed(url)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=len(self.urls)) as executor:
+            return self.collect(list(executor.map(fetch_feed, self.urls)))
+
+    async def fetch_async(self, client: httpx.AsyncClient) -> list[gtfs_realtime_pb2.FeedMessage]:
+        results = await asyncio.gather(
+            *(self.fetch_feed_async(client, url) for url in self.urls), return_exceptions=True
+        )
+        return self.collect(results)
+
+    def to_proto(self, data: list[gtfs_realtime_pb2.FeedMessage]) -> gtfs_realtime_pb2.FeedMessage:
+        return merge_trip_feeds(data)
@@ -3,33 +3,111 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 import datetime
+import json
+import pickle
+from pathlib import Path
 
+import httpx
 import requests
 
-# TODO: add https://www.wienerlinien.at/ogd_realtime/newsList
+from pickle_files import atomic_pickle_dump
+from shared_cache import cache_dir
+from sources import user_agent
+
+traffic_info_url = "https://www.wienerlinien.at/ogd_realtime/trafficInfoList"
+news_list_url = "https://www.wienerlinien.at/ogd_realtime/newsList"
+
+current_dir = Path(__file__).parent
 
 session = requests.Session(
 )
 session.headers.update({
-    "User-Agent": "Basic-GTFS-RT-Proxy (https://git.lw1.at/lukas/motis-git-annex/src/branch/synced/main/gtfs_rt_proxy)"
+    "User-Agent": user_agent
 })
 
+def parse_response(body: bytes) -> dict:
+    # json.loads() directly on the bytes, r.json() of requests would first guess the encoding and decode the whole body
+    return json.loads(body)
+
+
+max_cache_age = datetime.timedelta(minutes=4, seconds=50)
+# news are mostly announcements of planned changes, so they are refreshed less often
+news_max_cache_age = datetime.timedelta(minutes=14, seconds=50)
+
 
 class ViennaDisruptionAPI:
-    def __init__(self):
+    """
+    One endpoint of the Wiener Linien realtime API, every endpoint has its own cache.
+
+    The last good response is also saved to `cache_file`,
+    so that after a restart it can be used again (with the time it was fetched) until the next refresh.
+    """
+
+    def __init__(self, url: str = traffic_info_url, name: str = "Vienna disruptions",
+                 max_age: datetime.timedelta = max_cache_age, cache_file: Path | None = None):
+        self.url = url
+        self.name = name
+        self.max_age = max_age
+        self.cache_file = cache_file
         self.last_updated = datetime.datetime(year=2000, month=1, day=1)
         self.cached_api_response = {}
 
-    def current_disruptions(self):
-        cache_age = datetime.datetime.now() - self.last_updated
-        if cache_age < datetime.timedelta(minutes=4, seconds=50):
-            return self.cached_api_response
-        r = session.get("https://www.wienerlinien.at/ogd_realtime/trafficInfoList")
+    def refresh(self) -> None:
+        r = session.get(self.url, timeout=30)
+        r.raise_for_status()
+        self.update(parse_response(r.content))
+        self.save(r.content)
+
+    async def refresh_async(self, client: httpx.AsyncClient) -> None:
+        r = await client.get(self.url, timeout=30)
         r.raise_for_status()
-        data = r.json()
-        self.last_updated = datetime.datetime.now()
+        self.update(parse_response(r.content))
+        self.save(r.content)
+
+    def update(self, data: dict, last_updated: datetime.datetime | None = None) -> None:
+        self.last_updated = last_updated or datetime.datetime.now()
         self.cached_api_response = data
-        return data
 
+    def save(self, body: bytes) -> None:
+        if self.cache_file is None:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            atomic_pickle_dump(self.cache_file, (self.last_updated, body))
+        except OSError as e:
+            print(f"failed to save the last {self.name} response: {e!r}")
+
+    def load(self) -> bool:
+        """
+        use the response saved by an earlier run, if there is one
+        """
+        if self.cache_file is None or not self.cache_file.exists():
+            return False
+        try:
+            with self.cache_file.open("rb") as f:
+                last_updated, body = pickle.load(f)
+            self.update(parse_response(body), last_updated)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError) as e:
+            print(f"ignoring the saved {self.name} response: {e!r}")
+            return False
+        return True
+
+    def age(self) -> datetime.timedelta:
+        return datetime.datetime.now() - self.last_updated
 
-vienna_disruptions_api = ViennaDisruptionAPI()
+    def is_stale(self) -> bool:
+        return self.age() >= self.max_age
+
+    def current_disruptions(self):
+        if self.is_stale():
+            self.refresh()
+        return self.cached_api_response
+
+
+# the last responses are runtime state, so they are kept with the snapshots if there is a cache directory
+last_response_dir = cache_dir if cache_dir is not None else current_dir
+
+vienna_disruptions_api = ViennaDisruptionAPI(cache_file=last_response_dir / "last_traffic_info_list.pickle")
+vienna_news_api = ViennaDisruptionAPI(
+    news_list_url, "Vienna news", news_max_cache_age, cache_file=last_response_dir / "last_news_list.pickle"
+)
@@ -0,0 +1,74 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+guess the GTFS-RT cause and effect of a disruption from its text
+
+The keywords are listed in alert_classification.json.
+If multiple keywords are found in a text, the one listed first wins.
+"""
+import json
+from pathlib import Path
+
+from google.protobuf.internal.enum_type_wrapper import EnumTypeWrapper
+
+from proto import gtfs_realtime_pb2
+
+current_dir = Path(__file__).parent
+
+
+class KeywordClassifier:
+    """
+    Returns the value of the first rule whose keyword is contained in the text.
+
+    The texts are short (about 60 characters on average), so checking them with `in` for every keyword
+    is a lot faster than a single compiled regex over all keywords.
+    """
+
+    def __init__(self, rules: list[dict], enum: EnumTypeWrapper):
+        self.rules = []
+        for rule in rules:
+            ignore_case = rule.get("ignore_case", False)
+            keyword = rule["text"].lower() if ignore_case else rule["text"]
+            self.rules.append((keyword, ignore_case, enum.Value(rule["value"])))
+        self.any_ignore_case = any(ignore_case for _, ignore_case, _ in self.rules)
+
+    def classify(self, text: str) -> int | None:
+        text_lower = text.lower() if self.any_ignore_case else text
+        for keyword, ignore_case, value in self.rules:
+            if keyword in (text_lower if ignore_case else text):
+                return value
+        return None
+
+
+def load_classifiers(path: Path = current_dir / "alert_classification.json"):
+    with path.open() as f:
+        rules = json.load(f)
+    return (
+        KeywordClassifier(rules["cause"], gtfs_realtime_pb2.Alert.Cause),
+        KeywordClassifier(rules["effect"], gtfs_realtime_pb2.Alert.Effect),
+    )
+
+
+cause_classifier, effect_classifier = load_classifiers()
+
+if __name__ == "__main__":
+    from collections import Counter
+
+    from vienna.conversion import disruptions_from_api
+
+    for example in sorted((current_dir / "examples").glob("*.json")):
+        with example.open() as f:
+            _, traffic_infos = disruptions_from_api(json.load(f))
+        causes = Counter()
+        effects = Counter()
+        for info in traffic_infos.values():
+            text = info["title"] + " " + info["description"]
+            cause = cause_classifier.classify(text)
+            effect = effect_classifier.classify(text)
+            causes[gtfs_realtime_pb2.Alert.Cause.Name(cause) if cause is not None else "(no match)"] += 1
+            effects[gtfs_realtime_pb2.Alert.Effect.Name(effect) if effect is not None else "(no match)"] += 1
+        print(example.name)
+        print("  causes: ", dict(causes.most_common()))
+        print("  effects:", dict(effects.most_common()))
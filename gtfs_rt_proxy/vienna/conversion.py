@@ -3,39 +3,15 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
-import json
 from datetime import datetime
-from pathlib import Path
 
+import metrics
 from proto import gtfs_realtime_pb2
-
-current_dir = Path(__file__).parent
-
-
-def load_line_mapping():
-    with open(current_dir / "line_to_gtfs_id_mapping.json") as f:
-        mapping_data = json.load(f)
-        line_to_gtfs_id_mapping = mapping_data["mapping"]
-        mapping_feed_version = str(mapping_data["meta"]["version"])
-    line_to_gtfs_id_mapping["WLB"] = "at:vor:1515:"
-    return line_to_gtfs_id_mapping, mapping_feed_version
-
-
-def load_stop_mapping():
-    with open(current_dir / "stopid_to_gtfs_id_mapping.json") as f:
-        raw_data = json.load(f)
-        stop_to_gtfs_id_mapping = {}
-        for key, value in raw_data["mapping"].items():
-            val = value["gtfs_stop_id"]
-            if val is None:
-                continue
-            stop_to_gtfs_id_mapping[int(key)] = val
-        stop_mapping_feed_version = str(raw_data["meta"]["gtfs_stops"]["version"])
-        return stop_to_gtfs_id_mapping, stop_mapping_feed_version
-
-
-line_to_gtfs_id_mapping, mapping_feed_version = load_line_mapping()
-stop_to_gtfs_id_mapping, stop_mapping_feed_version = load_stop_mapping()
+from vienna.classification import cause_classifier, effect_classifier
+from vienna.elevators import elevator_to_entity
+from vienna.mapping_index import Mappings, get_mappings
+from vienna.stop_index import StopIndex, get_stop_index
+from vienna.trip_updates import add_trip_updates
 
 
 def disruptions_from_api(api_response: dict):
@@ -53,156 +29,202 @@ def disruptions_from_api(api_response: dict):
         info["category"] = traffic_info_categories[info["refTrafficInfoCategoryId"]][
             "name"
         ]
-        if info["category"] == "aufzugsinfo":
-            # TODO: support elevator disruptions properly
-            continue
         traffic_infos[info["name"]] = info
     return server_time, traffic_infos
 
 
+def news_from_api(api_response: dict) -> dict:
+    """
+    the newsList (announcements, planned elevator maintenance, ...) in the same form as the trafficInfos
+    """
+    value = api_response["message"]["value"]
+    if value != "OK":
+        raise ValueError(value)
+
+    poi_categories = {
+        c["id"]: c for c in api_response["data"].get("poiCategories", [])
+    }
+
+    news = {}
+    for poi in api_response["data"].get("pois", []):
+        info = dict(poi)
+        category = poi_categories.get(poi.get("refPoiCategoryId"), {}).get("name", "")
+        info["category"] = "aufzugsinfo" if category.startswith("aufzug") else category
+        info.setdefault("description", poi.get("subtitle", ""))
+        info.setdefault("time", {})
+        # the names are only unique within one endpoint
+        news["news-" + poi["name"]] = info
+    return news
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def alert_key(alert: gtfs_realtime_pb2.Alert) -> tuple:
+    texts = [t.text for t in alert.header_text.translation] + [t.text for t in alert.description_text.translation]
+    entities = sorted((ie.route_id, ie.stop_id) for ie in alert.informed_entity)
+    # e.g. recurring elevator maintenance has the same text for every date
+    periods = sorted((period.start, period.end) for period in alert.active_period)
+    return normalize_text(" ".join(texts)), tuple(entities), tuple(periods)
+
+
+# entities built by the last conversion by trafficInfo name, together with the input they were built from
+# and their alert_key
+entity_cache: dict[str, tuple[tuple, gtfs_realtime_pb2.FeedEntity | None, tuple | None]] = {}
+# the mappings and stop index used for the cached entities
+entity_cache_mappings: Mappings | None = None
+entity_cache_stop_index: StopIndex | None = None
+
+
+def disruption_to_entity(
+    disr_id: str, disr: dict, lines: list[str], mappings: Mappings
+) -> gtfs_realtime_pb2.FeedEntity:
+    d = gtfs_realtime_pb2.FeedEntity()
+    d.id = disr_id
+
+    alert = d.alert
+
+    title = disr["title"]
+    description = disr["description"]
+    all_text = title + " " + description
+
+    for line in lines:
+        try:
+            line_gtfs_id = mappings.line_to_gtfs_id[line]
+        except KeyError:
+            print(f"failed to match line {line}")
+            metrics.unmatched.inc(kind="line")
+            continue
+        ie = alert.informed_entity.add()
+        ie.route_id = line_gtfs_id
+
+    if "relatedStops" in disr:
+        for stop in disr["relatedStops"]:
+            try:
+                stop_gtfs_id = mappings.stop_to_gtfs_id[stop]
+                ie = alert.informed_entity.add()
+                ie.stop_id = stop_gtfs_id
+            except KeyError:
+                print(f"failed to match stop {stop}")
+                metrics.unmatched.inc(kind="stop")
+
+    # input date format is "2026-02-20T20:54:00.000+0100"
+    active_period = alert.active_period.add()
+    if "start" in disr["time"]:
+        active_period.start = int(
+            datetime.fromisoformat(disr["time"]["start"]).timestamp()
+        )
+    if "end" in disr["time"]:
+        active_period.end = int(datetime.fromisoformat(disr["time"]["end"]).timestamp())
+
+    cause = cause_classifier.classify(all_text)
+    if cause is None:
+        print("unknown cause: " + all_text)
+        metrics.unknown_classification.inc(field="cause")
+        cause = alert.UNKNOWN_CAUSE
+    alert.cause = cause
+
+    effect = effect_classifier.classify(all_text)
+    if effect is None:
+        print("unknown effect: " + all_text)
+        metrics.unknown_classification.inc(field="effect")
+        effect = alert.UNKNOWN_EFFECT
+    alert.effect = effect
+
+    url = alert.url.translation.add()
+    url.text = "https://www.wienerlinien.at/betriebsinfo"
+    url.language = "de"
+
+    header_text = alert.header_text.translation.add()
+    header_text.text = title
+    header_text.language = "de"
+
+    description_text = alert.description_text.translation.add()
+    description_text.text = description
+    description_text.language = "de"
+
+    return d
+
+
 def disruptions_to_proto(
     server_time: datetime, traffic_infos: dict
 ) -> gtfs_realtime_pb2.FeedMessage:
+    """
+    Only disruptions that are new or changed since the last call are converted,
+    all others reuse the entity built back then.
+    """
+    global entity_cache, entity_cache_mappings, entity_cache_stop_index
+    mappings = get_mappings()
+    stop_index = get_stop_index()
+    if mappings is not entity_cache_mappings or stop_index is not entity_cache_stop_index:
+        entity_cache = {}
     feed = gtfs_realtime_pb2.FeedMessage()
     feed.header.gtfs_realtime_version = "2.0"
     feed.header.timestamp = int(server_time.timestamp())
-    feed.header.feed_version = mapping_feed_version
+    feed.header.feed_version = mappings.feed_version
 
-    duplicate_cache = {
-        "lines": set(),
-        "stops": set(),
-    }
+    duplicate_lines = set()
+    published_alerts = set()
+    new_entity_cache = {}
 
     for disr_id, disr in traffic_infos.items():
-        d = feed.entity.add()
-        d.id = disr_id
-
-        alert = d.alert
-
-        title = disr["title"]
-        description = disr["description"]
-        all_text = title + " " + description
+        if disr["category"] == "aufzugsinfo":
+            entity_input = (
+                disr["title"],
+                disr["description"],
+                tuple(disr.get("attributes", {}).items()),
+                tuple(disr.get("relatedStops", [])),
+                disr.get("time", {}).get("start"),
+                disr.get("time", {}).get("end"),
+            )
+        else:
+            all_text = disr["title"] + " " + disr["description"]
 
-        if "relatedLines" in disr:
-            for line in disr["relatedLines"]:
+            # a line is only linked once to the same text, even if it appears in multiple disruptions
+            lines = []
+            for line in disr.get("relatedLines", []):
                 cache_key = line + all_text
-                if cache_key in duplicate_cache["lines"]:
-                    continue
-                line_gtfs_id = line_to_gtfs_id_mapping[line]
-                ie = alert.informed_entity.add()
-                ie.route_id = line_gtfs_id
-                duplicate_cache["lines"].add(cache_key)
-
-        if "relatedStops" in disr:
-            for stop in disr["relatedStops"]:
-                cache_key = str(stop) + all_text
-                if cache_key in duplicate_cache["stops"]:
-                    print("skip duplicate stop")
+                if cache_key in duplicate_lines:
                     continue
-
-                try:
-                    stop_gtfs_id = stop_to_gtfs_id_mapping[stop]
-                    ie = alert.informed_entity.add()
-                    ie.stop_id = stop_gtfs_id
-                except KeyError:
-                    print(f"failed to match stop {stop}")
-
-        # input date format is "2026-02-20T20:54:00.000+0100"
-        active_period = alert.active_period.add()
-        if "start" in disr["time"]:
-            active_period.start = int(
-                datetime.fromisoformat(disr["time"]["start"]).timestamp()
+                lines.append(line)
+                duplicate_lines.add(cache_key)
+
+            entity_input = (
+                disr["title"],
+                disr["description"],
+                tuple(lines),
+                tuple(disr.get("relatedStops", [])),
+                disr["time"].get("start"),
+                disr["time"].get("end"),
             )
-        if "end" in disr["time"]:
-            active_period.end = int(datetime.fromisoformat(disr["time"]["end"]).timestamp())
-
-        # TODO: map these disruptions to actual trips and provide tripupdates
-
-        all_text_lower = all_text.lower()
-        if "Demonstration" in all_text:
-            alert.cause = alert.DEMONSTRATION
-        elif "unfall" in all_text_lower:
-            alert.cause = alert.ACCIDENT
-        elif "Streik" in all_text:
-            alert.cause = alert.STRIKE
-        elif "technisch" in all_text_lower:
-            alert.cause = alert.TECHNICAL_PROBLEM
-        elif "schadhaft" in all_text_lower:
-            alert.cause = alert.TECHNICAL_PROBLEM
-        elif "gleisschaden" in all_text_lower:
-            alert.cause = alert.TECHNICAL_PROBLEM
-        elif "witterung" in all_text_lower:
-            alert.cause = alert.WEATHER
-        elif "Wartung" in all_text:
-            alert.cause = alert.MAINTENANCE
-        elif "Rettungseinsatz" in all_text:
-            alert.cause = alert.MEDICAL_EMERGENCY
-        elif "Feuerwehreinsatz" in all_text:
-            alert.cause = alert.ACCIDENT
-        elif "Polizeieinsatz" in all_text:
-            alert.cause = alert.POLICE_ACTIVITY
-        elif "Bauarbeiten" in all_text:
-            alert.cause = alert.CONSTRUCTION
-        elif "Gleisbauarbeiten" in all_text:
-            alert.cause = alert.CONSTRUCTION
-        elif "Kranarbeiten" in all_text:
-            alert.cause = alert.CONSTRUCTION
-        elif "Fahrtbehinderung" in all_text:
-            alert.cause = alert.OTHER_CAUSE
-        elif "Falschparker" in all_text:
-            alert.cause = alert.OTHER_CAUSE
-        elif "Verkehrsüberlastung" in all_text:
-            alert.cause = alert.OTHER_CAUSE
-        else:
-            print("unknown cause: " + all_text)
-            alert.cause = alert.UNKNOWN_CAUSE
-
-        if "unterschiedlichen Intervallen" in all_text:
-            alert.effect = alert.UNKNOWN_EFFECT
-        elif "Verspätungen" in all_text:
-            alert.effect = alert.SIGNIFICANT_DELAYS
-        elif "Längere Wartezeiten" in all_text:
-            alert.effect = alert.SIGNIFICANT_DELAYS
-        elif "Planen Sie daher bitte mehr Zeit ein" in all_text:
-            alert.effect = alert.SIGNIFICANT_DELAYS
-        elif "Weichen Sie" in all_text:
-            alert.effect = alert.REDUCED_SERVICE
-        elif "Betrieb ab" in all_text:
-            alert.effect = alert.REDUCED_SERVICE
-        elif "Betrieb nur bis" in all_text:
-            alert.effect = alert.REDUCED_SERVICE
-        elif "Fahrtbehinderung" in all_text:
-            alert.effect = alert.REDUCED_SERVICE
-        elif "Verzögerung" in all_text:
-            alert.effect = alert.SIGNIFICANT_DELAYS
-        elif "Betrieb ist derzeit eingestellt" in all_text:
-            alert.effect = alert.NO_SERVICE
-        elif "Kein Betrieb" in all_text:
-            alert.effect = alert.NO_SERVICE
-        elif "aufgelassen" in all_text:
-            alert.effect = alert.NO_SERVICE
-        elif "Züge halten " in all_text or "Busse halten " in all_text:
-            alert.effect = alert.NO_SERVICE
-        elif "an der Weiterfahrt gehindert" in all_text:
-            alert.effect = alert.NO_SERVICE
-        elif "nicht eingehalten werden" in all_text or "Busse halten " in all_text:
-            alert.effect = alert.STOP_MOVED
+        cached = entity_cache.get(disr_id)
+        if cached is not None and cached[0] == entity_input:
+            _, entity, key = cached
+            metrics.entity_cache.inc(result="hit")
         else:
-            print("unknown effect: " + all_text)
-            alert.effect = alert.UNKNOWN_EFFECT
-
-        url = alert.url.translation.add()
-        url.text = "https://www.wienerlinien.at/betriebsinfo"
-        url.language = "de"
+            metrics.entity_cache.inc(result="miss")
+            if disr["category"] == "aufzugsinfo":
+                entity = elevator_to_entity(disr_id, disr, mappings, stop_index)
+            else:
+                entity = disruption_to_entity(disr_id, disr, lines, mappings)
+            key = None if entity is None else alert_key(entity.alert)
+        new_entity_cache[disr_id] = (entity_input, entity, key)
+        if entity is None:
+            continue
 
-        header_text = alert.header_text.translation.add()
-        header_text.text = title
-        header_text.language = "de"
+        # the same alert is often both in the trafficInfoList and the newsList
+        # (or linked to several stops that map to the same GTFS stop), only the first one is kept
+        if key in published_alerts:
+            continue
+        published_alerts.add(key)
+        feed.entity.append(entity)
 
-        description_text = alert.description_text.translation.add()
-        description_text.text = description
-        description_text.language = "de"
+    entity_cache = new_entity_cache
+    entity_cache_mappings = mappings
+    entity_cache_stop_index = stop_index
 
+    add_trip_updates(feed, server_time, traffic_infos)
     return feed
 
 
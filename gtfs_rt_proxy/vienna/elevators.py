@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+alerts for elevator disruptions ("aufzugsinfo")
+
+They are attached to the affected platforms and their station, so they don't show up on every trip of the line.
+Entries without relatedStops are matched by the name of the station.
+"""
+from datetime import datetime
+
+import metrics
+from proto import gtfs_realtime_pb2
+from vienna.classification import cause_classifier
+from vienna.mapping_index import Mappings
+from vienna.stop_index import StopIndex
+
+
+def elevator_stop_ids(disr: dict, mappings: Mappings, stop_index: StopIndex | None) -> list[str]:
+    # a dict keeps the order without duplicates
+    stop_ids: dict[str, None] = {}
+    for stop in disr.get("relatedStops", []):
+        try:
+            stop_gtfs_id = mappings.stop_to_gtfs_id[stop]
+        except KeyError:
+            print(f"failed to match stop {stop}")
+            metrics.unmatched.inc(kind="stop")
+            continue
+        stop_ids[stop_gtfs_id] = None
+        if stop_index is not None:
+            station = stop_index.station(stop_gtfs_id)
+            if station is not None:
+                stop_ids[station] = None
+    if not stop_ids and stop_index is not None:
+        stop_ids.update(dict.fromkeys(stop_index.stations_by_name(disr["title"])))
+    return list(stop_ids)
+
+
+def elevator_to_entity(
+    disr_id: str, disr: dict, mappings: Mappings, stop_index: StopIndex | None
+) -> gtfs_realtime_pb2.FeedEntity | None:
+    stop_ids = elevator_stop_ids(disr, mappings, stop_index)
+    if not stop_ids:
+        print(f"failed to match elevator disruption at {disr['title']}")
+        metrics.unmatched.inc(kind="elevator")
+        return None
+
+    d = gtfs_realtime_pb2.FeedEntity()
+    d.id = disr_id
+    alert = d.alert
+
+    for stop_id in stop_ids:
+        ie = alert.informed_entity.add()
+        ie.stop_id = stop_id
+
+    time = disr.get("time", {})
+    if "start" in time or "end" in time:
+        active_period = alert.active_period.add()
+        if "start" in time:
+            active_period.start = int(datetime.fromisoformat(time["start"]).timestamp())
+        if "end" in time:
+            active_period.end = int(datetime.fromisoformat(time["end"]).timestamp())
+
+    attributes = disr.get("attributes", {})
+    reason = attributes.get("reason", "")
+    # most entries don't give a reason, so unknown causes are expected here
+    alert.cause = cause_classifier.classify(disr["description"] + " " + reason) or alert.UNKNOWN_CAUSE
+    alert.effect = alert.ACCESSIBILITY_ISSUE
+
+    url = alert.url.translation.add()
+    url.text = "https://www.wienerlinien.at/betriebsinfo"
+    url.language = "de"
+
+    header_text = alert.header_text.translation.add()
+    header_text.text = f"{disr['title']}: Aufzug {attributes.get('status', 'außer Betrieb')}"
+    header_text.language = "de"
+
+    description_text = alert.description_text.translation.add()
+    description_text.text = disr["description"] + (f"\n{reason}" if reason else "")
+    description_text.language = "de"
+
+    return d
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+compact index of line_to_gtfs_id_mapping.json and stopid_to_gtfs_id_mapping.json
+
+The JSON files also contain names and distances for every stop, which are only useful for checking the mapping.
+The index only keeps the IDs and is rebuilt automatically if it is older than one of the JSON files.
+It is stored in GTFS_RT_PROXY_CACHE_DIR if that is set, as the code directory might be read-only.
+To build it ahead of time (e.g. after running lineid_mapping.py or match_vienna_stops.py):
+
+    python -m vienna.mapping_index
+"""
+import json
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+from pickle_files import atomic_pickle_dump
+from shared_cache import cache_dir
+
+current_dir = Path(__file__).parent
+
+line_mapping_file = current_dir / "line_to_gtfs_id_mapping.json"
+stop_mapping_file = current_dir / "stopid_to_gtfs_id_mapping.json"
+index_file = (cache_dir if cache_dir is not None else current_dir) / "mapping_index.pickle"
+
+
+@dataclass(frozen=True, slots=True)
+class Mappings:
+    line_to_gtfs_id: dict[str, str]
+    stop_to_gtfs_id: dict[int, str]
+    feed_version: str
+    stop_feed_version: str
+
+
+def load_line_mapping():
+    with open(line_mapping_file) as f:
+        mapping_data = json.load(f)
+        line_to_gtfs_id_mapping = mapping_data["mapping"]
+        mapping_feed_version = str(mapping_data["meta"]["version"])
+    line_to_gtfs_id_mapping["WLB"] = "at:vor:1515:"
+    return line_to_gtfs_id_mapping, mapping_feed_version
+
+
+def load_stop_mapping():
+    with open(stop_mapping_file) as f:
+        raw_data = json.load(f)
+        stop_to_gtfs_id_mapping = {}
+        for key, value in raw_data["mapping"].items():
+            val = value["gtfs_stop_id"]
+            if val is None:
+                continue
+            stop_to_gtfs_id_mapping[int(key)] = val
+        stop_mapping_feed_version = str(raw_data["meta"]["gtfs_stops"]["version"])
+        return stop_to_gtfs_id_mapping, stop_mapping_feed_version
+
+
+def build_index() -> Mappings:
+    line_to_gtfs_id, feed_version = load_line_mapping()
+    stop_to_gtfs_id, stop_feed_version = load_stop_mapping()
+    data = (line_to_gtfs_id, stop_to_gtfs_id, feed_version, stop_feed_version)
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_pickle_dump(index_file, data)
+    except OSError as e:
+        # the mappings can still be used, the index is just built from the JSON files again next time
+        print(f"failed to write {index_file}: {e!r}")
+    return Mappings(*data)
+
+
+def index_is_current() -> bool:
+    if not index_file.exists():
+        return False
+    index_mtime = index_file.stat().st_mtime
+    return index_mtime >= line_mapping_file.stat().st_mtime and index_mtime >= stop_mapping_file.stat().st_mtime
+
+
+def load_index() -> Mappings:
+    if not index_is_current():
+        return build_index()
+    with index_file.open("rb") as f:
+        return Mappings(*pickle.load(f))
+
+
+def mapping_files_stamp() -> tuple[int, int]:
+    return line_mapping_file.stat().st_mtime_ns, stop_mapping_file.stat().st_mtime_ns
+
+
+_mappings: Mappings | None = None
+_mappings_stamp: tuple[int, int] | None = None
+# the files that couldn't be loaded, they are only tried again once they change
+_failed_stamp: tuple[int, int] | None = None
+
+
+def mappings_changed() -> bool:
+    if _mappings is None:
+        return False
+    stamp = mapping_files_stamp()
+    return stamp != _mappings_stamp and stamp != _failed_stamp
+
+
+def get_mappings() -> Mappings:
+    """
+    The mappings are only loaded on first use, so workers that only serve a shared snapshot never load them.
+    If the JSON files changed since, the new mappings are loaded and replace the old ones.
+    """
+    global _mappings, _mappings_stamp, _failed_stamp
+    stamp = mapping_files_stamp()
+    if _mappings is not None and stamp in (_mappings_stamp, _failed_stamp):
+        return _mappings
+    try:
+        mappings = load_index()
+    except (OSError, ValueError, KeyError) as e:
+        # e.g. if a JSON file is still being written, try again once it changed again
+        if _mappings is None:
+            raise
+        print(f"failed to reload mappings, keeping the old ones: {e!r}")
+        _failed_stamp = stamp
+        return _mappings
+    if _mappings is not None:
+        print(f"reloaded mappings (feed version {_mappings.feed_version} -> {mappings.feed_version})")
+    _mappings, _mappings_stamp = mappings, stamp
+    return mappings
+
+
+if __name__ == "__main__":
+    mappings = build_index()
+    print(f"{len(mappings.line_to_gtfs_id)} lines and {len(mappings.stop_to_gtfs_id)} stops "
+          f"written to {index_file} ({index_file.stat().st_size / 1e3:.0f} kB)")
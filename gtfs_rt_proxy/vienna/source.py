@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Wiener Linien alerts from the trafficInfoList and the newsList
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import httpx
+
+from proto import gtfs_realtime_pb2
+from sources import Source
+from vienna.api import max_cache_age, vienna_disruptions_api, vienna_news_api
+from vienna.conversion import disruptions_from_api, disruptions_to_proto, news_from_api
+from vienna.mapping_index import mappings_changed
+
+
+def refresh_news() -> None:
+    # the newsList is only optional, so the feed is still updated with the old news if it fails
+    try:
+        if vienna_news_api.is_stale():
+            vienna_news_api.refresh()
+    except Exception as e:
+        print(f"failed to refresh {vienna_news_api.name}: {e!r}")
+
+
+async def refresh_news_async(client: httpx.AsyncClient) -> None:
+    try:
+        if vienna_news_api.is_stale():
+            await vienna_news_api.refresh_async(client)
+    except Exception as e:
+        print(f"failed to refresh {vienna_news_api.name}: {e!r}")
+
+
+class ViennaSource(Source):
+    name = "vienna"
+    max_age = max_cache_age
+
+    def fetch(self) -> tuple[dict, dict]:
+        # both endpoints are fetched concurrently, but are cached independently
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            news = executor.submit(refresh_news)
+            vienna_disruptions_api.refresh()
+            news.result()
+        return vienna_disruptions_api.cached_api_response, vienna_news_api.cached_api_response
+
+    async def fetch_async(self, client: httpx.AsyncClient) -> tuple[dict, dict]:
+        await asyncio.gather(vienna_disruptions_api.refresh_async(client), refresh_news_async(client))
+        return vienna_disruptions_api.cached_api_response, vienna_news_api.cached_api_response
+
+    def normalize(self, raw: tuple[dict, dict]) -> tuple[datetime, dict]:
+        api_response, news_response = raw
+        server_time, traffic_infos = disruptions_from_api(api_response)
+        if news_response:
+            try:
+                # added after the trafficInfos, so these take precedence over duplicated news
+                traffic_infos.update(news_from_api(news_response))
+            except (KeyError, ValueError) as e:
+                print(f"ignoring invalid newsList response: {e!r}")
+        return server_time, traffic_infos
+
+    def to_proto(self, data: tuple[datetime, dict]) -> gtfs_realtime_pb2.FeedMessage:
+        server_time, traffic_infos = data
+        return disruptions_to_proto(server_time, traffic_infos)
+
+    def restore(self) -> tuple[tuple[dict, dict], timedelta] | None:
+        if not vienna_disruptions_api.load():
+            return None
+        vienna_news_api.load()
+        return (
+            (vienna_disruptions_api.cached_api_response, vienna_news_api.cached_api_response),
+            vienna_disruptions_api.age()
+        )
+
+    def needs_rebuild(self) -> bool:
+        # e.g. after a new VOR feed, the new mappings are used without a restart or an additional upstream request
+        return mappings_changed()
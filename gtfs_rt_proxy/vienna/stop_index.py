@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+index of the VOR stations in Vienna from the gtfs_stops table in color.db
+
+Elevator disruptions refer to platforms (relatedStops) or only to the name of the station,
+so the index maps platforms to their station and normalized station names to station IDs.
+It is built ahead of time (after load_gtfs.py and match_vienna_stops.py):
+
+    python -m vienna.stop_index [path/to/color.db]
+"""
+import argparse
+import re
+import sqlite3
+from pathlib import Path
+
+from pickle_files import ReloadingPickle, atomic_pickle_dump
+from vienna.mapping_index import load_stop_mapping
+
+current_dir = Path(__file__).parent
+default_database_file = current_dir.parent.parent / "color-data" / "color.db"
+index_file = current_dir / "stop_index.pickle"
+
+# stations further away from all mapped Wiener Linien stops (in degrees) are not indexed,
+# so that e.g. "Hauptbahnhof" can't match a station outside Vienna
+bbox_margin = 0.01
+
+
+def normalize_name(name: str) -> str:
+    name = name.casefold().replace("ß", "ss")
+    name = re.sub(r"^wien\s+", "", name)
+    return re.sub(r"\W+", "", name)
+
+
+class StopIndex:
+    def __init__(self, parent_stations: dict[str, str], station_names: dict[str, list[str]]):
+        self.parent_stations = parent_stations
+        self.station_names = station_names
+
+    def station(self, stop_id: str) -> str | None:
+        return self.parent_stations.get(stop_id)
+
+    def stations_by_name(self, name: str) -> list[str]:
+        return self.station_names.get(normalize_name(name), [])
+
+
+def build_index(database_file: Path) -> StopIndex:
+    stop_mapping, _ = load_stop_mapping()
+    mapped_stops = set(stop_mapping.values())
+    conn = sqlite3.connect(database_file)
+
+    parent_stations = {}
+    lats = []
+    lons = []
+    for stop_id, parent_station, lat, lon in conn.execute(
+        """
+        SELECT stop_id, parent_station, stop_lat, stop_lon
+        FROM gtfs_stops
+        WHERE dataset_name = '05_vor' AND location_type IS NULL
+        """
+    ):
+        if stop_id not in mapped_stops:
+            continue
+        if parent_station:
+            parent_stations[stop_id] = parent_station
+        lats.append(lat)
+        lons.append(lon)
+    if not lats:
+        raise ValueError("none of the mapped stops are in gtfs_stops")
+
+    station_names: dict[str, list[str]] = {}
+    for stop_id, stop_name in conn.execute(
+        """
+        SELECT stop_id, stop_name
+        FROM gtfs_stops
+        WHERE dataset_name = '05_vor' AND location_type = 1
+          AND stop_lon BETWEEN ? AND ?
+          AND stop_lat BETWEEN ? AND ?
+        """, [min(lons) - bbox_margin, max(lons) + bbox_margin, min(lats) - bbox_margin, max(lats) + bbox_margin]
+    ):
+        station_names.setdefault(normalize_name(stop_name), []).append(stop_id)
+    conn.close()
+
+    return StopIndex(parent_stations, station_names)
+
+
+def write_index(index: StopIndex) -> None:
+    data = (index.parent_stations, index.station_names)
+    atomic_pickle_dump(index_file, data)
+
+
+_index = ReloadingPickle(index_file, StopIndex)
+
+
+def get_stop_index() -> StopIndex | None:
+    """
+    the index is loaded on first use and reloaded if the file changed, None if it was never built
+    """
+    return _index.get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database_file", nargs="?", type=Path, default=default_database_file)
+    args = parser.parse_args()
+    stop_index = build_index(args.database_file)
+    write_index(stop_index)
+    print(f"{len(stop_index.parent_stations)} platforms and {len(stop_index.station_names)} station names "
+          f"written to {index_file} ({index_file.stat().st_size / 1e3:.0f} kB)")
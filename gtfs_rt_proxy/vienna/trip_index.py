@@ -0,0 +1,205 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+index of all Wiener Linien trips in the VOR GTFS feed by route and service day
+
+Building it reads the whole stop_times.txt, so this is done ahead of time (after each new VOR feed):
+
+    python -m vienna.trip_index [path/to/05_vor.zip]
+
+At runtime finding all trips of a route in a time window only needs a few bisections.
+"""
+import argparse
+import bisect
+import csv
+import io
+import zipfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+from pickle_files import ReloadingPickle, atomic_pickle_dump
+from vienna.mapping_index import load_line_mapping, load_stop_mapping
+
+current_dir = Path(__file__).parent
+default_gtfs_file = current_dir.parent.parent / "datasets" / "gtfs" / "05_vor.zip"
+index_file = current_dir / "trip_index.pickle"
+
+timezone = ZoneInfo("Europe/Vienna")
+
+
+def parse_gtfs_date(value: str) -> date:
+    return datetime.strptime(value, "%Y%m%d").date()
+
+
+def parse_gtfs_time(value: str) -> int:
+    """
+    seconds since the start of the service day (can be more than 24h)
+    """
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def service_day_start(service_date: date) -> datetime:
+    # GTFS times are relative to noon minus 12h, which differs from midnight on days with a DST change
+    return datetime.combine(service_date, time(12), tzinfo=timezone) - timedelta(hours=12)
+
+
+def read_csv(archive: zipfile.ZipFile, name: str) -> Iterator[dict[str, str]]:
+    if name not in archive.namelist():
+        return
+    with archive.open(name) as f:
+        yield from csv.DictReader(io.TextIOWrapper(f, encoding="utf-8-sig"))
+
+
+class TripIndex:
+    def __init__(self, base_date: date, service_days: dict[str, int], routes: dict, patterns: list[tuple[str, ...]],
+                 parent_stations: dict[str, str], feed_version: str):
+        # bit n of service_days[service_id] is set if the service runs on base_date + n days
+        self.base_date = base_date
+        self.service_days = service_days
+        # route_id -> service_id -> (start_times, end_times, trip_ids, pattern_ids, longest_trip),
+        # sorted by start time in seconds since the start of the service day
+        self.routes = routes
+        # the stops of each distinct stop sequence
+        self.patterns = patterns
+        self.parent_stations = parent_stations
+        self.feed_version = feed_version
+
+    def runs_on(self, service_id: str, service_date: date) -> bool:
+        offset = (service_date - self.base_date).days
+        return offset >= 0 and bool(self.service_days.get(service_id, 0) >> offset & 1)
+
+    def trips(self, route_id: str, start: datetime, end: datetime) -> Iterator[tuple[str, date, tuple[str, ...]]]:
+        """
+        (trip_id, service date, stops) of all trips of the route that run at some point between start and end
+        """
+        services = self.routes.get(route_id)
+        if not services:
+            return
+        # trips after midnight belong to the service day before
+        service_date = start.astimezone(timezone).date() - timedelta(days=1)
+        while service_date <= end.astimezone(timezone).date():
+            day_start = service_day_start(service_date)
+            window_start = (start - day_start).total_seconds()
+            window_end = (end - day_start).total_seconds()
+            for service_id, (start_times, end_times, trip_ids, pattern_ids, longest_trip) in services.items():
+                if not self.runs_on(service_id, service_date):
+                    continue
+                # only trips starting in this range can still be running during the window
+                first = bisect.bisect_left(start_times, window_start - longest_trip)
+                last = bisect.bisect_right(start_times, window_end)
+                for i in range(first, last):
+                    if end_times[i] >= window_start:
+                        yield trip_ids[i], service_date, self.patterns[pattern_ids[i]]
+            service_date += timedelta(days=1)
+
+    def station(self, stop_id: str) -> str:
+        return self.parent_stations.get(stop_id, stop_id)
+
+
+def build_index(gtfs_file: Path) -> TripIndex:
+    line_mapping, _ = load_line_mapping()
+    route_ids = set(line_mapping.values())
+    archive = zipfile.ZipFile(gtfs_file)
+
+    feed_version = next(read_csv(archive, "feed_info.txt"), {}).get("feed_version", "")
+
+    services: dict[str, set[date]] = {}
+    for row in read_csv(archive, "calendar.txt"):
+        weekdays = [row[day] == "1" for day in
+                    ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")]
+        day = parse_gtfs_date(row["start_date"])
+        end = parse_gtfs_date(row["end_date"])
+        days = services.setdefault(row["service_id"], set())
+        while day <= end:
+            if weekdays[day.weekday()]:
+                days.add(day)
+            day += timedelta(days=1)
+    for row in read_csv(archive, "calendar_dates.txt"):
+        days = services.setdefault(row["service_id"], set())
+        if row["exception_type"] == "1":
+            days.add(parse_gtfs_date(row["date"]))
+        else:
+            days.discard(parse_gtfs_date(row["date"]))
+    base_date = min((min(days) for days in services.values() if days), default=date.today())
+    service_days = {
+        service_id: sum(1 << (day - base_date).days for day in days)
+        for service_id, days in services.items()
+    }
+
+    trips = {}
+    for row in read_csv(archive, "trips.txt"):
+        if row["route_id"] in route_ids:
+            trips[row["trip_id"]] = (row["route_id"], row["service_id"])
+
+    stop_times: dict[str, list[tuple[int, str, int, int]]] = {}
+    for row in read_csv(archive, "stop_times.txt"):
+        if row["trip_id"] not in trips:
+            continue
+        arrival = row["arrival_time"] or row["departure_time"]
+        departure = row["departure_time"] or row["arrival_time"]
+        stop_times.setdefault(row["trip_id"], []).append((
+            int(row["stop_sequence"]), row["stop_id"], parse_gtfs_time(arrival), parse_gtfs_time(departure)
+        ))
+
+    patterns: dict[tuple[str, ...], int] = {}
+    grouped: dict[str, dict[str, list[tuple[int, int, str, int]]]] = {}
+    for trip_id, times in stop_times.items():
+        times.sort()
+        pattern = tuple(stop_id for _, stop_id, _, _ in times)
+        pattern_id = patterns.setdefault(pattern, len(patterns))
+        route_id, service_id = trips[trip_id]
+        grouped.setdefault(route_id, {}).setdefault(service_id, []).append(
+            (times[0][3], times[-1][2], trip_id, pattern_id)
+        )
+
+    routes = {}
+    for route_id, route_services in grouped.items():
+        routes[route_id] = {}
+        for service_id, route_trips in route_services.items():
+            route_trips.sort()
+            start_times, end_times, trip_ids, pattern_ids = (list(column) for column in zip(*route_trips))
+            longest_trip = max(end - start for start, end, _, _ in route_trips)
+            routes[route_id][service_id] = (start_times, end_times, trip_ids, pattern_ids, longest_trip)
+
+    # alerts and trips might refer to different platforms of the same station
+    stop_mapping, _ = load_stop_mapping()
+    relevant_stops = {stop_id for pattern in patterns for stop_id in pattern} | set(stop_mapping.values())
+    parent_stations = {
+        row["stop_id"]: row["parent_station"]
+        for row in read_csv(archive, "stops.txt")
+        if row["stop_id"] in relevant_stops and row.get("parent_station")
+    }
+
+    return TripIndex(base_date, service_days, routes, list(patterns), parent_stations, feed_version)
+
+
+def write_index(index: TripIndex) -> None:
+    data = (index.base_date, index.service_days, index.routes, index.patterns, index.parent_stations,
+            index.feed_version)
+    atomic_pickle_dump(index_file, data)
+
+
+_index = ReloadingPickle(index_file, TripIndex)
+
+
+def get_trip_index() -> TripIndex | None:
+    """
+    the index is loaded on first use and reloaded if the file changed, None if it was never built
+    """
+    return _index.get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gtfs_file", nargs="?", type=Path, default=default_gtfs_file)
+    args = parser.parse_args()
+    trip_index = build_index(args.gtfs_file)
+    write_index(trip_index)
+    num_trips = sum(len(trips[2]) for services in trip_index.routes.values() for trips in services.values())
+    print(f"{num_trips} trips on {len(trip_index.routes)} routes with {len(trip_index.patterns)} stop patterns "
+          f"written to {index_file} ({index_file.stat().st_size / 1e6:.1f} MB)")
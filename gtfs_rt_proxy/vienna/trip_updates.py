@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2025 Lukas Winkler
+# SPDX-FileContributor: Lukas Winkler
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+TripUpdates for all trips affected by NO_SERVICE alerts, so that MOTIS can route around them
+
+The effect of an alert is only a rough guess from its text (e.g. "Busse halten ..." mostly announces a moved stop),
+so only alerts that clearly say that the service is suspended are turned into TripUpdates.
+If the alert names stops, these stops are skipped by all trips of the alert's routes that pass them.
+If the disruption doesn't list any stops, all trips of the routes are canceled while the alert is active.
+"""
+from datetime import datetime, timedelta, timezone
+
+from proto import gtfs_realtime_pb2
+from vienna.trip_index import get_trip_index
+
+# only trips in the next few hours get a TripUpdate
+horizon = timedelta(hours=3)
+
+# texts that mean that there is no service at all, not just a changed stop or route
+suspension_phrases = ("Betrieb ist derzeit eingestellt", "Kein Betrieb")
+
+
+def is_suspension(alert: gtfs_realtime_pb2.Alert) -> bool:
+    if alert.effect != alert.NO_SERVICE:
+        return False
+    texts = [t.text for t in alert.header_text.translation] + [t.text for t in alert.description_text.translation]
+    return any(phrase in text for text in texts for phrase in suspension_phrases)
+
+
+def add_trip_updates(feed: gtfs_realtime_pb2.FeedMessage, server_time: datetime, traffic_infos: dict) -> None:
+    """
+    `traffic_infos` are the disruptions the alerts were converted from, by entity ID
+    """
+    index = get_trip_index()
+    if index is None:
+        return
+
+    canceled: dict[tuple[str, str], str] = {}
+    skipped: dict[tuple[str, str], tuple[str, dict[str, None]]] = {}
+    for entity in list(feed.entity):
+        if not entity.HasField("alert") or not is_suspension(entity.alert):
+            continue
+        alert = entity.alert
+        route_ids = [ie.route_id for ie in alert.informed_entity if ie.route_id]
+        stations = {index.station(ie.stop_id) for ie in alert.informed_entity if ie.stop_id}
+        if not stations and traffic_infos.get(entity.id, {}).get("relatedStops"):
+            # none of its stops could be matched, so we don't know which part of the line is affected
+            continue
+        for period in alert.active_period:
+            start = server_time
+            if period.start:
+                start = max(start, datetime.fromtimestamp(period.start, tz=timezone.utc))
+            end = server_time + horizon
+            if period.end:
+                end = min(end, datetime.fromtimestamp(period.end, tz=timezone.utc))
+            if start >= end:
+                continue
+            for route_id in route_ids:
+                for trip_id, service_date, stops in index.trips(route_id, start, end):
+                    key = (trip_id, service_date.strftime("%Y%m%d"))
+                    if not stations:
+                        canceled[key] = route_id
+                        continue
+                    affected_stops = [stop_id for stop_id in stops if index.station(stop_id) in stations]
+                    if affected_stops:
+                        # a dict keeps the order of the stops along the trip without duplicates
+                        skipped.setdefault(key, (route_id, {}))[1].update(dict.fromkeys(affected_stops))
+
+    for (trip_id, start_date), route_id in canceled.items():
+        trip_update = add_trip_update(feed, trip_id, start_date, route_id)
+        trip_update.trip.schedule_relationship = trip_update.trip.CANCELED
+
+    for (trip_id, start_date), (route_id, stops) in skipped.items():
+        if (trip_id, start_date) in canceled:
+            continue
+        trip_update = add_trip_update(feed, trip_id, start_date, route_id)
+        for stop_id in stops:
+            stop_time_update = trip_update.stop_time_update.add()
+            stop_time_update.stop_id = stop_id
+            stop_time_update.schedule_relationship = stop_time_update.SKIPPED
+
+
+def add_trip_update(
+    feed: gtfs_realtime_pb2.FeedMessage, trip_id: str, start_date: str, route_id: str
+) -> gtfs_realtime_pb2.TripUpdate:
+    entity = feed.entity.add()
+    entity.id = f"{trip_id}:{start_date}"
+    trip_update = entity.trip_update
+    trip_update.trip.trip_id = trip_id
+    trip_update.trip.start_date = start_date
+    trip_update.trip.route_id = route_id
+    return trip_update